@@ -1,34 +1,2356 @@
-import customtkinter as ctk
+from time import sleep, time, perf_counter
+
+STARTUP_TIME = perf_counter()
+
 import json
 import os
-from datetime import datetime
-from tkinter import messagebox
-from tkcalendar import DateEntry
-from PIL import Image, ImageDraw
+from datetime import datetime, timedelta, timezone
 import threading
-import pystray
-from time import sleep
-import winreg
+import queue
+import heapq
+import bisect
+import calendar
+import re
+import itertools
+import shutil
+import sqlite3
 import sys
-
-ctk.set_appearance_mode("Dark")
-ctk.set_default_color_theme("dark-blue")
+import argparse
+import collections
+import contextlib
+import functools
+import gc
+import uuid
+import socket
+import secrets
+import csv
+
+# customtkinter и tkinter подгружаются в load_ui(): командная строка (Lins.py add ...) обходится без них
+ctk = None
+messagebox = None
 
 TASKS_FILE = "tasks.json"
 SETTINGS_FILE = "settings.json"
+JOURNAL_FILE = "tasks.journal"
+DATABASE_FILE = "tasks.db"
+ARCHIVE_FILE = "tasks.archive"
+METRICS_LOG_FILE = "lins_metrics.log"
+INSTANCE_FILE = "lins.instance"
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+
+
+def load_ui():
+    global ctk, messagebox
+    if ctk is None:
+        import customtkinter
+        from tkinter import messagebox as tk_messagebox
+
+        customtkinter.set_appearance_mode("Dark")
+        customtkinter.set_default_color_theme("dark-blue")
+        ctk = customtkinter
+        messagebox = tk_messagebox
+    return ctk
+
+
+def parse_timestamp(text):
+    # Пустые поля (completed_at, snoozed_until у большинства задач) не проходят через strptime и исключение
+    if not text:
+        return None
+    try:
+        return int(datetime.strptime(text, DATE_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def format_timestamp(ts):
+    if ts is None:
+        return ""
+    return datetime.fromtimestamp(ts).strftime(DATE_FORMAT)
+
+
+RECURRENCE_TITLES = {
+    "daily": "Каждый день",
+    "weekly": "Каждую неделю",
+    "monthly": "Каждый месяц"
+}
+RECURRENCE_PATTERN = re.compile(r"^(daily|weekly|monthly(:([1-9]|[12]\d|3[01]))?)$")
+
+
+def recurrence_rule(period, due):
+    # Для ежемесячных задач в правиле запоминается день месяца: после февраля задача на 31-е
+    # должна вернуться на 31-е, а не остаться на 28-м
+    if period == "monthly":
+        return f"monthly:{datetime.fromtimestamp(due).day}"
+    return period
+
+
+def next_occurrence(due, rule, after):
+    # Ближайший срок по правилу строго позже after; пропущенные повторы перескакиваются
+    # арифметикой, без перебора, а время суток сохраняется по местным часам
+    period, _, day = rule.partition(":")
+    moment = datetime.fromtimestamp(due)
+    after = max(after, due)
+    if period in ("daily", "weekly"):
+        step = 7 if period == "weekly" else 1
+        steps = max((datetime.fromtimestamp(after).date() - moment.date()).days // step, 1)
+        candidate = moment + timedelta(days=steps * step)
+        if candidate.timestamp() <= after:
+            candidate += timedelta(days=step)
+        return int(candidate.timestamp())
+    if period == "monthly":
+        day = int(day) if day else moment.day
+        target = datetime.fromtimestamp(after)
+        months = max((target.year - moment.year) * 12 + target.month - moment.month, 1)
+        while True:
+            year, month = divmod(moment.month - 1 + months, 12)
+            year += moment.year
+            candidate = moment.replace(year=year, month=month + 1,
+                                       day=min(day, calendar.monthrange(year, month + 1)[1]))
+            if candidate.timestamp() > after:
+                return int(candidate.timestamp())
+            months += 1
+    return None
+
+
+class Task:
+    # Сроки хранятся как секунды эпохи и разбираются один раз при загрузке;
+    # в tasks.json по-прежнему пишутся строки вида "дд.мм.гггг ЧЧ:ММ"
+    __slots__ = ("id", "description", "due", "completed", "created", "completed_at", "recurrence",
+                 "alert", "snoozed_until")
+
+    def __init__(self, description, due, completed=False, created=None, task_id=None, completed_at=None,
+                 recurrence=None, alert="none", snoozed_until=None):
+        self.id = task_id or uuid.uuid4().hex
+        self.description = description
+        self.due = due
+        self.completed = completed
+        self.created = created
+        self.completed_at = completed_at
+        self.recurrence = recurrence
+        self.alert = alert
+        self.snoozed_until = snoozed_until
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("description", ""),
+            parse_timestamp(data.get("due")),
+            bool(data.get("completed", False)),
+            parse_timestamp(data.get("created")),
+            data.get("id"),
+            parse_timestamp(data.get("completed_at")),
+            data.get("recurrence"),
+            data.get("alert", "none"),
+            parse_timestamp(data.get("snoozed_until"))
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "description": self.description,
+            "due": format_timestamp(self.due),
+            "completed": self.completed,
+            "created": format_timestamp(self.created),
+            "completed_at": format_timestamp(self.completed_at),
+            "recurrence": self.recurrence,
+            "alert": self.alert,
+            "snoozed_until": format_timestamp(self.snoozed_until)
+        }
+
+    def is_overdue(self, now):
+        return not self.completed and self.due is not None and now > self.due
+
+    def replace(self, **changes):
+        # Загруженные задачи не меняются на месте: правка создаёт новую версию объекта,
+        # поэтому копия списка, отданная фоновому потоку, остаётся согласованной
+        task = Task.__new__(Task)
+        for name in self.__slots__:
+            setattr(task, name, changes.pop(name, getattr(self, name)))
+        if changes:
+            raise TypeError(f"Неизвестные поля задачи: {', '.join(changes)}")
+        return task
+
+    def rolled_forward(self, now):
+        # Повторяющаяся задача хранит только ближайший срок; выполнение сдвигает его на следующий
+        return self.replace(due=next_occurrence(self.due, self.recurrence, now), alert="none", snoozed_until=None)
+
+
+class TaskStore:
+    # Рабочий набор задач по идентификатору. Читать и менять его можно только из главного потока:
+    # словарь меняется на месте без блокировок, поэтому запись стоит O(1) при любом числе задач.
+    # Фоновой работе (экспорт, сжатие журнала) главный поток передаёт собственную копию списка задач;
+    # сами задачи не меняются, правка заменяет объект задачи новым через Task.replace
+    def __init__(self, tasks=()):
+        self._tasks = {task.id: task for task in tasks}
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def values(self):
+        return self._tasks.values()
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def apply(self, put=(), remove=()):
+        for task in put:
+            self._tasks[task.id] = task
+        for task_id in remove:
+            self._tasks.pop(task_id, None)
+
+
+class AlertPolicy:
+    # Оповещения о задаче идут только вперёд, и каждый переход срабатывает один раз:
+    # none → warned (за warn_before до срока) → due (срок) → overdue (через escalate_after после срока).
+    # Отложенное оповещение повторяет текущее состояние в snoozed_until
+    STATES = ("none", "warned", "due", "overdue")
+
+    def __init__(self, warn_before, escalate_after, snooze):
+        self.warn_before = warn_before
+        self.escalate_after = escalate_after
+        self.snooze = snooze
+
+    def transitions(self, task):
+        return (
+            ("warned", task.due - self.warn_before),
+            ("due", task.due),
+            ("overdue", task.due + self.escalate_after)
+        )
+
+    def next_alert(self, task, now):
+        # Если пропущено несколько переходов (например, программа была закрыта), срабатывает только последний
+        if task.completed or task.due is None:
+            return None
+        rank = self.STATES.index(task.alert) if task.alert in self.STATES else 0
+        pending = [step for step in self.transitions(task) if self.STATES.index(step[0]) > rank]
+        passed = [step for step in pending if step[1] <= now]
+        step = passed[-1] if passed else (pending[0] if pending else None)
+        if task.snoozed_until is not None and (step is None or task.snoozed_until < step[1]):
+            step = (task.alert, task.snoozed_until)
+        return step
+
+
+class DescriptionTip:
+    # Одна всплывающая подсказка на приложение: при наведении на обрезанное описание карточки
+    # показывает полный текст. Окно создаётся при первом показе и дальше только прячется
+    DELAY_MS = 400
+
+    def __init__(self, root):
+        self.root = root
+        self.window = None
+        self.label = None
+        self.job = None
+        self.visible = False
+
+    def schedule(self, text, x, y):
+        self.hide()
+        self.job = self.root.after(self.DELAY_MS, self.show, text, x, y)
+
+    def show(self, text, x, y):
+        self.job = None
+        if self.window is None:
+            self.window = ctk.CTkToplevel(self.root)
+            self.window.withdraw()
+            self.window.overrideredirect(True)
+            self.window.attributes("-topmost", True)
+            self.window.configure(fg_color="#2D2D2D", border_width=1, border_color="#444")
+            self.label = ctk.CTkLabel(self.window, text="", wraplength=360, justify="left",
+                                      font=("Arial", 12), text_color="white")
+            self.label.pack(padx=8, pady=6)
+        self.label.configure(text=text)
+        self.window.geometry(f"+{x + 12}+{y + 16}")
+        self.window.deiconify()
+        self.visible = True
+
+    def hide(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        if self.visible:
+            self.window.withdraw()
+            self.visible = False
+
+
+def truncated_description(task, limit):
+    # Текст для карточки и полный текст для подсказки; у коротких описаний подсказки нет
+    desc = task.description
+    if len(desc) > limit:
+        return desc[:limit - 1] + "…", desc
+    return desc, None
+
+
+class TaskCard:
+    DESCRIPTION_LIMIT = 60
+
+    def __init__(self, canvas, app):
+        self.canvas = canvas
+        self.app = app
+        self.task_id = None
+        self.slot = None
+        self.full_description = None
+        self.wraplength = 220
+
+        self.frame = ctk.CTkFrame(canvas, fg_color="#333333", corner_radius=10)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.desc_label = ctk.CTkLabel(
+            self.frame,
+            text="",
+            anchor="w",
+            justify="left",
+            wraplength=220,
+            font=("Arial", 14, "bold")
+        )
+        self.desc_label.pack(anchor="w", padx=10, pady=(8, 4))
+
+        self.due_label = ctk.CTkLabel(self.frame, text="", anchor="w", font=("Arial", 12))
+        self.due_label.pack(anchor="w", padx=10)
+
+        self.created_label = ctk.CTkLabel(self.frame, text="", anchor="w", text_color="gray", font=("Arial", 10))
+        self.created_label.pack(anchor="w", padx=10, pady=(0, 8))
+
+        status_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        status_frame.pack(fill="x", padx=10, pady=(0, 8))
+        self.status_label = ctk.CTkLabel(status_frame, text="")
+        self.status_label.pack(anchor="w")
+
+        action_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        action_frame.pack(fill="x", padx=10, pady=(4, 8))
+
+        self.complete_btn = ctk.CTkButton(
+            action_frame,
+            image=app.img_complete if app.img_complete else None,
+            text="Выполнить" if not app.img_complete else "",
+            width=60,
+            height=25,
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white",
+            font=("Arial", 12),
+            command=lambda: self.app.complete_task(self.task_id)
+        )
+        self.complete_btn.pack(side="left", padx=4)
+
+        self.delete_btn = ctk.CTkButton(
+            action_frame,
+            image=app.img_delete if app.img_delete else None,
+            text="Удалить" if not app.img_delete else "",
+            width=60,
+            height=25,
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white",
+            font=("Arial", 12),
+            command=lambda: self.app.delete_task(self.task_id)
+        )
+        self.delete_btn.pack(side="left", padx=4)
+        self.complete_visible = True
+
+        self.snooze_btn = ctk.CTkButton(
+            action_frame,
+            text="⏰",
+            width=30,
+            height=25,
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white",
+            font=("Arial", 12),
+            command=lambda: self.app.snooze_task(self.task_id)
+        )
+        self.snooze_visible = False
+
+        for widget in (self.frame, self.desc_label, self.due_label, self.created_label, self.status_label):
+            widget.bind("<MouseWheel>", app._on_mousewheel)
+        self.desc_label.bind("<Enter>", self._on_description_enter)
+        self.desc_label.bind("<Leave>", lambda event: self.app.description_tip.hide())
+
+        self.window_id = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+
+    def bind(self, task):
+        self.task_id = task.id
+
+        desc, self.full_description = truncated_description(task, self.DESCRIPTION_LIMIT)
+        completed = task.completed
+
+        fg_color = "#FF4C4C" if task.is_overdue(time()) else "white"
+
+        self.desc_label.configure(text=desc, text_color=fg_color)
+        due_text = f"Срок: {format_timestamp(task.due)}"
+        if task.recurrence:
+            due_text += f"  🔁 {RECURRENCE_TITLES.get(task.recurrence.partition(':')[0], '')}"
+        self.due_label.configure(text=due_text, text_color=fg_color)
+        self.created_label.configure(text=f"Создано: {format_timestamp(task.created)}")
+
+        if self.app.img_complete and self.app.img_pending:
+            self.status_label.configure(image=self.app.img_complete if completed else self.app.img_pending)
+        else:
+            self.status_label.configure(
+                text="✅ Выполнено" if completed else "🕒 В процессе",
+                text_color="green" if completed else "orange"
+            )
+
+        if completed and self.complete_visible:
+            self.complete_btn.pack_forget()
+            self.complete_visible = False
+        elif not completed and not self.complete_visible:
+            self.complete_btn.pack(side="left", padx=4, before=self.delete_btn)
+            self.complete_visible = True
+
+        alerted = not completed and task.alert in ("due", "overdue")
+        if alerted and not self.snooze_visible:
+            self.snooze_btn.pack(side="left", padx=4)
+            self.snooze_visible = True
+        elif not alerted and self.snooze_visible:
+            self.snooze_btn.pack_forget()
+            self.snooze_visible = False
+
+    def place(self, x, y, width, height):
+        self.canvas.coords(self.window_id, x, y)
+        self.canvas.itemconfigure(self.window_id, width=width, height=height, state="normal")
+        wraplength = max(int(width) - 20, 60)
+        if wraplength != self.wraplength:
+            self.wraplength = wraplength
+            self.desc_label.configure(wraplength=wraplength)
+
+    def _on_description_enter(self, event):
+        if self.full_description:
+            self.app.description_tip.schedule(self.full_description, event.x_root, event.y_root)
+
+    def hide(self):
+        self.task_id = None
+        self.slot = None
+        self.full_description = None
+        self.canvas.itemconfigure(self.window_id, state="hidden")
+
+    def destroy(self):
+        self.canvas.delete(self.window_id)
+        self.frame.destroy()
+
+
+def rounded_rect_points(x1, y1, x2, y2, radius):
+    # Вершины для create_polygon(smooth=True): сглаживание превращает двойные точки в скруглённые углы
+    return (
+        x1 + radius, y1, x2 - radius, y1, x2, y1, x2, y1 + radius,
+        x2, y2 - radius, x2, y2, x2 - radius, y2, x1 + radius, y2,
+        x1, y2, x1, y2 - radius, x1, y1 + radius, x1, y1
+    )
+
+
+class CanvasTaskCard:
+    # Карточка, нарисованная элементами общего холста вместо дерева виджетов CTk: около дюжины
+    # элементов холста на карточку. Кнопки тоже элементы холста, нажатия сопоставляет VirtualTaskGrid через hit()
+    DESCRIPTION_LIMIT = TaskCard.DESCRIPTION_LIMIT
+    RADIUS = 10
+    BUTTON_WIDTH = 60
+    BUTTON_HEIGHT = 25
+    BUTTON_TAG = "card_button"
+
+    _photos = {}
+
+    def __init__(self, canvas, app):
+        self.canvas = canvas
+        self.app = app
+        self.task_id = None
+        self.slot = None
+        self.geometry = None
+        self.full_description = None
+        self.scale = ctk.ScalingTracker.get_widget_scaling(canvas)
+
+        self.background = canvas.create_polygon(0, 0, 0, 0, smooth=True, fill="#333333", outline="", state="hidden")
+        self.desc_item = canvas.create_text(0, 0, anchor="nw", font=self.font(14, "bold"), state="hidden")
+        canvas.tag_bind(self.desc_item, "<Enter>", self._on_description_enter)
+        canvas.tag_bind(self.desc_item, "<Leave>", lambda event: self.app.description_tip.hide())
+        self.due_item = canvas.create_text(0, 0, anchor="nw", font=self.font(12), state="hidden")
+        self.created_item = canvas.create_text(0, 0, anchor="nw", fill="gray", font=self.font(10), state="hidden")
+        self.status_item = canvas.create_text(0, 0, anchor="nw", font=self.font(12), state="hidden")
+        self.status_image = canvas.create_image(0, 0, anchor="nw", state="hidden")
+
+        self.buttons = {}
+        self.actions = {}
+        for action, image, label in (
+            ("complete", app.img_complete, "Выполнить"),
+            ("delete", app.img_delete, "Удалить"),
+            ("snooze", None, "⏰")
+        ):
+            box = canvas.create_polygon(0, 0, 0, 0, smooth=True, fill="#444444", outline="",
+                                        state="hidden", tags=self.BUTTON_TAG)
+            photo = self.photo(image)
+            if photo is not None:
+                face = canvas.create_image(0, 0, image=photo, state="hidden", tags=self.BUTTON_TAG)
+            else:
+                face = canvas.create_text(0, 0, text=label, fill="white", font=self.font(12),
+                                          state="hidden", tags=self.BUTTON_TAG)
+            self.buttons[action] = (box, face)
+            self.actions[box] = self.actions[face] = action
+        self.visible_buttons = ()
+
+        self.items = [self.background, self.desc_item, self.due_item, self.created_item,
+                      self.status_item, self.status_image] + list(self.actions)
+
+    def font(self, size, *style):
+        # Отрицательный размер — пиксели, как у виджетов CTk с тем же масштабом
+        return ("Arial", -round(size * self.scale)) + style
+
+    def photo(self, image):
+        if image is None:
+            return None
+        photo = self._photos.get(id(image))
+        if photo is None:
+            photo = self._photos[id(image)] = image.create_scaled_photo_image(self.scale, "dark")
+        return photo
+
+    def bind(self, task):
+        self.task_id = task.id
+
+        desc, self.full_description = truncated_description(task, self.DESCRIPTION_LIMIT)
+        completed = task.completed
+        fg_color = "#FF4C4C" if task.is_overdue(time()) else "white"
+
+        due_text = f"Срок: {format_timestamp(task.due)}"
+        if task.recurrence:
+            due_text += f"  🔁 {RECURRENCE_TITLES.get(task.recurrence.partition(':')[0], '')}"
+
+        self.canvas.itemconfigure(self.desc_item, text=desc, fill=fg_color)
+        self.canvas.itemconfigure(self.due_item, text=due_text, fill=fg_color)
+        self.canvas.itemconfigure(self.created_item, text=f"Создано: {format_timestamp(task.created)}")
+
+        status_photo = self.photo(self.app.img_complete if completed else self.app.img_pending) \
+            if self.app.img_complete and self.app.img_pending else None
+        self.canvas.itemconfigure(self.status_image, image=status_photo or "")
+        self.canvas.itemconfigure(
+            self.status_item,
+            text="" if status_photo else ("✅ Выполнено" if completed else "🕒 В процессе"),
+            fill="green" if completed else "orange"
+        )
+
+        buttons = [] if completed else ["complete"]
+        buttons.append("delete")
+        if not completed and task.alert in ("due", "overdue"):
+            buttons.append("snooze")
+        self.visible_buttons = tuple(buttons)
+
+        if self.geometry is not None:
+            self._layout()
+
+    def place(self, x, y, width, height):
+        self.geometry = (x, y, width, height)
+        self._layout()
+
+    def _layout(self):
+        # Тексты идут друг под другом по фактической высоте, кнопки прижаты к нижнему краю
+        canvas = self.canvas
+        x, y, width, height = self.geometry
+        for item in self.items:
+            canvas.itemconfigure(item, state="hidden")
+
+        canvas.coords(self.background, *rounded_rect_points(x, y, x + width, y + height, self.RADIUS))
+        left = x + 10
+        # У текстовых элементов холста нет обрезки по рамке, как у меток CTk: длинные строки
+        # (срок с повтором, статус) переносятся по ширине карточки, а не заходят на соседнюю
+        text_width = max(width - 20, 60)
+        for item in (self.desc_item, self.due_item, self.created_item, self.status_item):
+            canvas.itemconfigure(item, width=text_width)
+        top = y + 8
+        for item, gap in ((self.desc_item, 4), (self.due_item, 0), (self.created_item, 8)):
+            canvas.coords(item, left, top)
+            canvas.itemconfigure(item, state="normal")
+            top = canvas.bbox(item)[3] + gap
+        canvas.coords(self.status_item, left, top)
+        canvas.coords(self.status_image, left, top)
+
+        button_width = self.BUTTON_WIDTH * self.scale
+        button_height = self.BUTTON_HEIGHT * self.scale
+        button_x = left
+        button_y = y + height - 8 - button_height
+        for action in self.visible_buttons:
+            box, face = self.buttons[action]
+            canvas.coords(box, *rounded_rect_points(button_x, button_y, button_x + button_width,
+                                                   button_y + button_height, 6))
+            canvas.coords(face, button_x + button_width / 2, button_y + button_height / 2)
+            canvas.itemconfigure(box, state="normal")
+            canvas.itemconfigure(face, state="normal")
+            button_x += button_width + 8
+
+        for item in (self.background, self.status_item, self.status_image):
+            canvas.itemconfigure(item, state="normal")
+
+    def hit(self, item):
+        action = self.actions.get(item)
+        if action in self.visible_buttons:
+            return action
+        return None
+
+    def _on_description_enter(self, event):
+        if self.full_description:
+            self.app.description_tip.schedule(self.full_description, event.x_root, event.y_root)
+
+    def hide(self):
+        self.task_id = None
+        self.slot = None
+        self.geometry = None
+        self.full_description = None
+        for item in self.items:
+            self.canvas.itemconfigure(item, state="hidden")
+
+    def destroy(self):
+        self.canvas.delete(*self.items)
+
+
+class VirtualTaskGrid:
+    # Источник отдаёт список разделов (заголовок, задачи); каждый раздел занимает строку заголовка
+    # и строки карточек, поэтому видимые карточки находятся арифметикой без обхода всех задач.
+    # Число колонок следует из ширины холста и пересчитывается не чаще раза в RESIZE_DEBOUNCE_MS
+    MIN_CELL_WIDTH = 190
+    MAX_COLUMNS = 8
+    RESIZE_DEBOUNCE_MS = 60
+    ROW_HEIGHT = 200
+    HEADER_HEIGHT = 36
+    PADDING = 10
+    OVERSCAN_ROWS = 1
+
+    def __init__(self, canvas, scrollbar, app, source, card_class=TaskCard):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.app = app
+        self.metrics = app.metrics
+        self.source = source
+        self.card_class = card_class
+
+        self.cards = {}
+        self.pool = []
+        self.headers = {}
+        self.placeholder = None
+        self.content_height = 0
+        self.columns = 4
+        self.width = 1
+        self.reflow_job = None
+        self.suspended = True
+
+        self.canvas.configure(yscrollcommand=self._on_yview)
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<Button-1>", self._on_click, add="+")
+        self.canvas.tag_bind(CanvasTaskCard.BUTTON_TAG, "<Enter>", lambda e: self.canvas.configure(cursor="hand2"))
+        self.canvas.tag_bind(CanvasTaskCard.BUTTON_TAG, "<Leave>", lambda e: self.canvas.configure(cursor=""))
+
+    def _on_click(self, event):
+        # Проверка попадания для нарисованных карточек: элемент под курсором ищется среди видимых карточек
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        for item in self.canvas.find_overlapping(x, y, x, y):
+            for card in self.cards.values():
+                action = getattr(card, "hit", lambda item: None)(item)
+                if action is not None:
+                    getattr(self.app, f"{action}_task")(card.task_id)
+                    return
+
+    def set_card_class(self, card_class):
+        if card_class is self.card_class:
+            return
+        suspended = self.suspended
+        self.teardown()
+        self.card_class = card_class
+        if not suspended:
+            self.resume()
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+
+    def _on_yview(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def cell_width(self):
+        return self.width / self.columns
+
+    def _on_configure(self, event):
+        # При перетаскивании края окна события идут потоком: раскладка пересчитывается
+        # по последнему размеру, не чаще одного раза за RESIZE_DEBOUNCE_MS
+        if self.reflow_job is None:
+            self.reflow_job = self.canvas.after(self.RESIZE_DEBOUNCE_MS, self.reflow)
+
+    def _measure(self):
+        width = max(self.canvas.winfo_width(), 1)
+        if width == self.width:
+            return False
+        self.width = width
+        self.columns = max(1, min(self.MAX_COLUMNS, width // self.MIN_CELL_WIDTH))
+        return True
+
+    def reflow(self):
+        # Существующие карточки не пересоздаются и не перепривязываются, а только переставляются
+        self.reflow_job = None
+        if self._measure():
+            for card in self.cards.values():
+                card.slot = None
+            if self.placeholder is not None:
+                self.canvas.coords(self.placeholder, self.width // 2, 40)
+        self.update()
+
+    def resume(self):
+        self.suspended = False
+        self._measure()
+        self.invalidate()
+
+    def teardown(self):
+        # Окно спрятано в трей: карточки и элементы холста уничтожаются, данные остаются у приложения.
+        # resume() заново создаёт карточки только для видимой области
+        self.suspended = True
+        for card in list(self.cards.values()) + self.pool:
+            card.destroy()
+        self.cards.clear()
+        self.pool.clear()
+        for item in self.headers.values():
+            self.canvas.delete(item)
+        self.headers.clear()
+        self._show_placeholder(False)
+
+    def invalidate(self):
+        # Полная перерисовка: пересчёт высоты содержимого и перепривязка видимых карточек
+        for card in self.cards.values():
+            self.release(card)
+        self.cards.clear()
+        self.update()
+
+    def update(self):
+        # Точечные правки и прокрутка идут мимо update_task_list, поэтому замеряются здесь
+        with self.metrics.timer("grid_update"):
+            self._update_scrollregion()
+            self.refresh()
+
+    def task_inserted(self):
+        self.update()
+
+    def task_changed(self, task):
+        card = self.cards.get(task.id)
+        if card is not None:
+            card.bind(task)
+        self.update()
+
+    def task_removed(self, task):
+        card = self.cards.pop(task.id, None)
+        if card is not None:
+            self.release(card)
+        self.update()
+
+    def _layout(self, sections):
+        layout = []
+        y = 0
+        for title, tasks in sections:
+            if not tasks:
+                continue
+            layout.append((title, tasks, y, y + self.HEADER_HEIGHT))
+            y += self.HEADER_HEIGHT + -(-len(tasks) // self.columns) * self.ROW_HEIGHT
+        return layout, y
+
+    def _update_scrollregion(self):
+        if self.suspended:
+            return
+        self.content_height = self._layout(self.source())[1]
+        height = max(self.content_height, self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, self.width, height))
+
+    def refresh(self):
+        if self.suspended:
+            return
+        with self.metrics.timer("grid_refresh"):
+            self._refresh()
+
+    def _refresh(self):
+        # Сверка видимого окна по идентификаторам задач: новые карточки привязываются,
+        # сдвинутые только перемещаются, ушедшие из окна возвращаются в пул
+        layout = self._layout(self.source())[0]
+        self._show_placeholder(not layout)
+
+        top = self.canvas.canvasy(0) - self.OVERSCAN_ROWS * self.ROW_HEIGHT
+        bottom = self.canvas.canvasy(0) + self.canvas.winfo_height() + self.OVERSCAN_ROWS * self.ROW_HEIGHT
+        cell_width = self.cell_width()
+        columns = self.columns
+
+        wanted = {}
+        visible_headers = {}
+        for title, tasks, header_y, rows_y in layout:
+            rows_end = rows_y + -(-len(tasks) // columns) * self.ROW_HEIGHT
+            if rows_end < top or header_y > bottom:
+                continue
+            visible_headers[title] = (f"{title} ({len(tasks)})", header_y)
+            first_row = max(0, int((top - rows_y) // self.ROW_HEIGHT))
+            last_row = int((bottom - rows_y) // self.ROW_HEIGHT)
+            start = first_row * columns
+            end = min(len(tasks), (last_row + 1) * columns)
+            for idx in range(start, end):
+                row, col = divmod(idx, columns)
+                wanted[tasks[idx].id] = (tasks[idx], (col, rows_y + row * self.ROW_HEIGHT))
+
+        for task_id in [t for t in self.cards if t not in wanted]:
+            self.release(self.cards.pop(task_id))
+
+        for task_id, (task, slot) in wanted.items():
+            card = self.cards.get(task_id)
+            if card is None:
+                card = self.acquire()
+                card.bind(task)
+                self.cards[task_id] = card
+            elif card.slot == slot:
+                continue
+            card.slot = slot
+            col, y = slot
+            card.place(
+                col * cell_width + self.PADDING,
+                y + self.PADDING,
+                cell_width - 2 * self.PADDING,
+                self.ROW_HEIGHT - 2 * self.PADDING
+            )
+
+        self._place_headers(visible_headers)
+
+    def _place_headers(self, visible):
+        for title, item in self.headers.items():
+            if title not in visible:
+                self.canvas.itemconfigure(item, state="hidden")
+        for title, (text, y) in visible.items():
+            item = self.headers.get(title)
+            if item is None:
+                item = self.headers[title] = self.canvas.create_text(
+                    self.PADDING + 4, 0, anchor="w", fill="gray", font=("Arial", 13, "bold")
+                )
+            self.canvas.coords(item, self.PADDING + 4, y + self.HEADER_HEIGHT // 2 + 4)
+            self.canvas.itemconfigure(item, text=text, state="normal")
+
+    def acquire(self):
+        if self.pool:
+            return self.pool.pop()
+        return self.card_class(self.canvas, self.app)
+
+    def release(self, card):
+        card.hide()
+        self.pool.append(card)
+
+    def _show_placeholder(self, show):
+        if show and self.placeholder is None:
+            self.placeholder = self.canvas.create_text(
+                self.width // 2, 40,
+                text="Нет задач.\nДобавьте новую!",
+                fill="gray",
+                font=("Arial", 14),
+                justify="center"
+            )
+        elif not show and self.placeholder is not None:
+            self.canvas.delete(self.placeholder)
+            self.placeholder = None
+
+
+class SortedTaskList:
+    # Задачи раздела, упорядоченные по сроку; вставка и удаление через bisect без пересортировки
+    def __init__(self):
+        self.keys = []
+        self.tasks = []
+
+    @staticmethod
+    def key(task):
+        return (task.due is None, task.due or 0, task.id)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __getitem__(self, index):
+        return self.tasks[index]
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def extend_sorted(self, tasks):
+        pairs = sorted(((self.key(task), task) for task in tasks), key=lambda pair: pair[0])
+        self.keys = [key for key, task in pairs]
+        self.tasks = [task for key, task in pairs]
+
+    def insert(self, task):
+        key = self.key(task)
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.tasks.insert(index, task)
+
+    def remove(self, task):
+        index = bisect.bisect_left(self.keys, self.key(task))
+        if index < len(self.tasks) and self.tasks[index] is task:
+            del self.keys[index]
+            del self.tasks[index]
+
+    def pop_due_before(self, moment):
+        count = bisect.bisect_left(self.keys, (False, moment, ""))
+        moved = self.tasks[:count]
+        del self.keys[:count]
+        del self.tasks[:count]
+        return moved
+
+
+class TaskViews:
+    # Разделы списка задач. Задачи переходят между разделами по таймеру в момент ближайшего
+    # перехода: истечение срока первой задачи «Сегодня» или наступление полуночи
+    BUCKETS = (
+        ("overdue", "Просрочено"),
+        ("today", "Сегодня"),
+        ("upcoming", "Предстоящие"),
+        ("completed", "Выполнено")
+    )
+
+    def __init__(self):
+        self.buckets = {name: SortedTaskList() for name, title in self.BUCKETS}
+        self.location = {}
+        self.end_of_today = 0
+
+    @staticmethod
+    def next_midnight(now):
+        today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return int((today + timedelta(days=1)).timestamp())
+
+    def classify(self, task, now):
+        if task.completed:
+            return "completed"
+        if task.due is None or task.due >= self.end_of_today:
+            return "upcoming"
+        if task.due <= now:
+            return "overdue"
+        return "today"
+
+    def rebuild(self, tasks, now):
+        self.end_of_today = self.next_midnight(now)
+        grouped = {name: [] for name in self.buckets}
+        self.location = {}
+        for task in tasks:
+            name = self.classify(task, now)
+            grouped[name].append(task)
+            self.location[task.id] = name
+        for name, bucket in self.buckets.items():
+            bucket.extend_sorted(grouped[name])
+
+    def add(self, task, now):
+        name = self.classify(task, now)
+        self.buckets[name].insert(task)
+        self.location[task.id] = name
+
+    def remove(self, task):
+        name = self.location.pop(task.id, None)
+        if name is not None:
+            self.buckets[name].remove(task)
+
+    def advance(self, now):
+        moved = []
+        if now >= self.end_of_today:
+            self.end_of_today = self.next_midnight(now)
+            for task in self.buckets["upcoming"].pop_due_before(self.end_of_today):
+                self.add(task, now)
+                moved.append(task)
+        for task in self.buckets["today"].pop_due_before(now + 1):
+            self.add(task, now)
+            moved.append(task)
+        return moved
+
+    def next_transition(self):
+        today = self.buckets["today"]
+        if today:
+            return min(today[0].due, self.end_of_today)
+        return self.end_of_today
+
+    def sections(self, matched=None):
+        if matched is None:
+            return [(title, self.buckets[name]) for name, title in self.BUCKETS]
+        # При поиске совпадения раскладываются по разделам и сортируются только они
+        grouped = {name: [] for name in self.buckets}
+        for task in matched:
+            name = self.location.get(task.id)
+            if name is not None:
+                grouped[name].append(task)
+        return [(title, sorted(grouped[name], key=SortedTaskList.key)) for name, title in self.BUCKETS]
+
+
+@contextlib.contextmanager
+def atomic_open(path, newline=None):
+    # Запись во временный файл и атомарная замена: файл на диске никогда не остаётся недописанным
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline=newline) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write(path, text):
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+class Metrics:
+    # Счётчики времени горячих путей: общее число, сумма, максимум и последние замеры для перцентилей
+    RECENT_SAMPLES = 200
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_BACKUPS = 3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (perf_counter() - start) * 1000)
+
+    def record(self, name, ms):
+        with self._lock:
+            stat = self.timers.get(name)
+            if stat is None:
+                stat = self.timers[name] = {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+                    "recent": collections.deque(maxlen=self.RECENT_SAMPLES)
+                }
+            stat["count"] += 1
+            stat["total_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+            stat["last_ms"] = ms
+            stat["recent"].append(ms)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, stat in self.timers.items():
+                recent = sorted(stat["recent"])
+                result[name] = {
+                    "count": stat["count"],
+                    "avg_ms": round(stat["total_ms"] / stat["count"], 3),
+                    "p50_ms": round(recent[len(recent) // 2], 3),
+                    "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3),
+                    "max_ms": round(stat["max_ms"], 3),
+                    "last_ms": round(stat["last_ms"], 3)
+                }
+            return result
+
+    def dump(self, path, extra=None):
+        # Одна строка JSON на снимок; при превышении размера файл сдвигается в .1, .2, ...
+        record = {"time": datetime.now().isoformat(timespec="seconds"), "timers": self.snapshot()}
+        if extra:
+            record.update(extra)
+        if os.path.exists(path) and os.path.getsize(path) > self.LOG_MAX_BYTES:
+            for index in range(self.LOG_BACKUPS - 1, 0, -1):
+                if os.path.exists(f"{path}.{index}"):
+                    os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+            os.replace(path, f"{path}.1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def timed(name):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LagWatchdog:
+    # Насколько позже запланированного срабатывает root.after: прямая мера задержки главного цикла
+    INTERVAL_MS = 250
+
+    def __init__(self, root, metrics):
+        self.root = root
+        self.metrics = metrics
+        self.expected = None
+        self.job = None
+
+    def start(self):
+        self.expected = perf_counter() + self.INTERVAL_MS / 1000
+        self.job = self.root.after(self.INTERVAL_MS, self._tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def _tick(self):
+        lag = max(0.0, (perf_counter() - self.expected) * 1000)
+        self.metrics.record("main_loop_lag", lag)
+        self.start()
+
+
+class PersistenceWorker:
+    # Все операции с диском выполняются в отдельном потоке: поток интерфейса только ставит задания.
+    # Перезапись файлов целиком откладывается на DEBOUNCE_SECONDS, и серия правок сливается в одну запись
+    DEBOUNCE_SECONDS = 0.5
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        self._jobs = collections.deque()
+        self._pending = {}
+        self._busy = False
+        self._flushing = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call(self, job):
+        with self._cond:
+            self._jobs.append(job)
+            self._cond.notify_all()
+
+    def write_json(self, path, data, indent=None):
+        with self._cond:
+            previous = self._pending.get(path)
+            deadline = previous[0] if previous else time() + self.DEBOUNCE_SECONDS
+            self._pending[path] = (deadline, data, indent)
+            self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            while self._jobs or self._pending or self._busy:
+                self._cond.wait()
+            self._flushing -= 1
+
+    def _next_job(self):
+        while True:
+            if self._jobs:
+                return self._jobs.popleft()
+            if self._pending:
+                path = min(self._pending, key=lambda p: self._pending[p][0])
+                delay = self._pending[path][0] - time()
+                if delay <= 0 or self._flushing:
+                    deadline, data, indent = self._pending.pop(path)
+                    return functools.partial(self._write_json, path, data, indent)
+                self._cond.wait(delay)
+                continue
+            self._busy = False
+            self._cond.notify_all()
+            self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                self._busy = True
+            start = perf_counter()
+            try:
+                job()
+            except Exception as e:
+                print(f"Ошибка фоновой записи на диск: {e}")
+            if self.metrics is not None:
+                self.metrics.record("disk_job", (perf_counter() - start) * 1000)
+
+    def _write_json(self, path, data, indent):
+        atomic_write(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+def open_journal_for_append(path):
+    journal = open(path, "a", encoding="utf-8")
+    if journal.tell():
+        # Недописанная последняя строка пропускается при чтении; новая запись не должна с ней склеиться
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                journal.write("\n")
+    return journal
+
+
+def pending_tasks_due_between(tasks, start, end=None):
+    return sorted(
+        (task for task in tasks
+         if not task.completed and task.due is not None and task.due >= start
+         and (end is None or task.due < end)),
+        key=lambda task: task.due
+    )
+
+
+class JsonTaskStorage:
+    # Снимок tasks.json плюс журнал изменений: каждая правка дописывает одну строку,
+    # а полная перезапись снимка выполняется в фоне, когда журнал разрастается
+    COMPACT_THRESHOLD = 500
+
+    def __init__(self, worker, path=TASKS_FILE, journal_path=JOURNAL_FILE):
+        self.worker = worker
+        self.path = path
+        self.journal_path = journal_path
+        self.rotated_path = journal_path + ".1"
+        self._journal = None
+        self._entries = 0
+        self._compacting = False
+        self._batch = None
+        self._batch_lock = threading.Lock()
+        self._tasks = {}
+
+    def load(self):
+        tasks = self._tasks
+        missing_ids = False
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for data in json.load(f):
+                        missing_ids = missing_ids or not data.get("id")
+                        task = Task.from_dict(data)
+                        tasks[task.id] = task
+            for path in (self.rotated_path, self.journal_path):
+                self._entries += self._replay(path, tasks)
+        finally:
+            self._open_journal()
+
+        # Остался журнал от прерванного сжатия или tasks.json старой версии без идентификаторов:
+        # сразу сводим всё в новый снимок, иначе записи журнала сошлются на идентификаторы,
+        # которые при следующей загрузке будут выданы заново
+        if missing_ids or os.path.exists(self.rotated_path):
+            self._write_snapshot([task.to_dict() for task in tasks.values()])
+            self._journal.close()
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+            self._open_journal("w")
+            self._entries = 0
+        return list(tasks.values())
+
+    def _open_journal(self, mode="a"):
+        if mode == "a":
+            self._journal = open_journal_for_append(self.journal_path)
+        else:
+            self._journal = open(self.journal_path, mode, encoding="utf-8")
+
+    def _replay(self, path, tasks):
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Недописанная строка при аварийном завершении
+                    continue
+                self._apply(record, tasks)
+                count += 1
+        return count
+
+    def _apply(self, record, tasks):
+        op = record.get("op")
+        if op in ("add", "update"):
+            task = Task.from_dict(record["task"])
+            tasks[task.id] = task
+        elif op == "delete":
+            tasks.pop(record["id"], None)
+
+    def _append(self, record):
+        # Строки копятся в пакете и дописываются фоновым потоком одной записью;
+        # задание записи привязано к своему пакету, поэтому порядок относительно сжатия сохраняется
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = []
+                self.worker.call(functools.partial(self._write_batch, self._batch))
+            self._batch.append(line)
+        self._entries += 1
+
+    def _write_batch(self, batch):
+        with self._batch_lock:
+            if self._batch is batch:
+                self._batch = None
+        try:
+            self._journal.write("".join(batch))
+            self._journal.flush()
+        except Exception as e:
+            print(f"Не удалось записать журнал задач: {e}")
+
+    def add(self, task):
+        self._tasks[task.id] = task
+        self._append({"op": "add", "task": task.to_dict()})
+
+    def add_many(self, tasks):
+        for task in tasks:
+            self.add(task)
+
+    def update(self, task):
+        self._tasks[task.id] = task
+        self._append({"op": "update", "task": task.to_dict()})
+
+    def delete(self, task):
+        self._tasks.pop(task.id, None)
+        self._append({"op": "delete", "id": task.id})
+
+    def pending_due_between(self, start, end=None):
+        return pending_tasks_due_between(self._tasks.values(), start, end)
+
+    def take_archivable(self):
+        # Снимок и журнал загружаются целиком: выполненные задачи архивируются из памяти
+        return []
+
+    def overdue(self, now):
+        return self.pending_due_between(0, now)
+
+    def needs_compaction(self):
+        return self._entries >= self.COMPACT_THRESHOLD and not self._compacting
+
+    def compact(self):
+        # В потоке интерфейса копируется только список задач: задачи не меняются на месте, поэтому
+        # to_dict, ротация журнала и запись tasks.json идут в фоновом потоке строго после всех
+        # уже поставленных строк журнала
+        if self._compacting:
+            return
+        self._compacting = True
+        self._entries = 0
+        snapshot = list(self._tasks.values())
+        with self._batch_lock:
+            # Текущий пакет уходит в старый журнал, следующие правки попадут уже в новый
+            self._batch = None
+            self.worker.call(functools.partial(self._compact, snapshot))
+
+    def _compact(self, snapshot):
+        try:
+            self._journal.close()
+            if os.path.exists(self.rotated_path):
+                # Предыдущее сжатие не удалось: его журнал нужно сохранить до записи снимка
+                with open(self.journal_path, "r", encoding="utf-8") as src, \
+                        open(self.rotated_path, "a", encoding="utf-8") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+            self._open_journal()
+            self._write_snapshot([task.to_dict() for task in snapshot])
+            os.remove(self.rotated_path)
+        except Exception as e:
+            print(f"Не удалось сжать журнал задач: {e}")
+            if self._journal.closed:
+                self._open_journal()
+        finally:
+            self._compacting = False
+
+    def _write_snapshot(self, snapshot):
+        atomic_write(self.path, json.dumps(snapshot, ensure_ascii=False, indent=4))
+
+    def close(self):
+        self.worker.call(self._close_journal)
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteTaskStorage:
+    # Индексы по (completed, due) позволяют выбирать ближайшие и просроченные задачи,
+    # не просматривая всю историю; полная запись задачи хранится в колонке data
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            due INTEGER,
+            completed INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        DROP INDEX IF EXISTS idx_tasks_due;
+        CREATE INDEX IF NOT EXISTS idx_tasks_completed_due ON tasks (completed, due);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, worker, path=DATABASE_FILE, completed_since=None):
+        self.worker = worker
+        self.path = path
+        self.completed_since = completed_since
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._archivable = []
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+
+    def load(self):
+        # В память попадают невыполненные задачи и выполненные со сроком не раньше completed_since
+        # (все части выбираются по idx_tasks_completed_due). Из выполненных с более ранним сроком
+        # остаются недавно выполненные, прочие отдаются в архив через take_archivable(): после
+        # переноса их строки удаляются, поэтому разбирать историю приходится только один раз
+        self._migrate_from_json()
+        with self._lock:
+            if self.completed_since is None:
+                rows = self._db.execute("SELECT data FROM tasks ORDER BY rowid").fetchall()
+                old_rows = []
+            else:
+                rows = self._db.execute(
+                    "SELECT data FROM tasks WHERE completed = 0 "
+                    "UNION ALL SELECT data FROM tasks WHERE completed = 1 AND due >= ? "
+                    "UNION ALL SELECT data FROM tasks WHERE completed = 1 AND due IS NULL",
+                    (self.completed_since,)
+                ).fetchall()
+                old_rows = self._db.execute(
+                    "SELECT data FROM tasks WHERE completed = 1 AND due < ?", (self.completed_since,)
+                ).fetchall()
+        for (data,) in rows:
+            task = Task.from_dict(json.loads(data))
+            self._tasks[task.id] = task
+        for (data,) in old_rows:
+            task = Task.from_dict(json.loads(data))
+            if (task.completed_at or task.due) >= self.completed_since:
+                self._tasks[task.id] = task
+            else:
+                self._archivable.append(task)
+        return list(self._tasks.values())
+
+    def take_archivable(self):
+        tasks, self._archivable = self._archivable, []
+        return tasks
+
+    def _migrate_from_json(self):
+        # Однократный перенос tasks.json и его журнала; отметка пишется в той же транзакции
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+                return
+        if os.path.exists(TASKS_FILE) or os.path.exists(JOURNAL_FILE):
+            legacy = JsonTaskStorage(self.worker)
+            try:
+                tasks = legacy.load()
+            finally:
+                legacy.close()
+        else:
+            tasks = []
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tasks (id, due, completed, data) VALUES (?, ?, ?, ?)",
+                [self._row(task) for task in tasks]
+            )
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)", (str(int(time())),))
+
+    def _row(self, task):
+        return task.id, task.due, int(task.completed), json.dumps(task.to_dict(), ensure_ascii=False)
+
+    def _execute(self, sql, params):
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(sql, params)
+            except Exception as e:
+                print(f"Не удалось записать задачу в базу: {e}")
+
+    def _submit(self, sql, params):
+        self.worker.call(functools.partial(self._execute, sql, params))
+
+    def _execute_many(self, sql, rows):
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(sql, rows)
+            except Exception as e:
+                print(f"Не удалось записать задачи в базу: {e}")
+
+    def add(self, task):
+        self._tasks[task.id] = task
+        self._submit("INSERT OR REPLACE INTO tasks (id, due, completed, data) VALUES (?, ?, ?, ?)", self._row(task))
+
+    def add_many(self, tasks):
+        # Пакет импорта записывается одной транзакцией
+        rows = []
+        for task in tasks:
+            self._tasks[task.id] = task
+            rows.append(self._row(task))
+        self.worker.call(functools.partial(
+            self._execute_many, "INSERT OR REPLACE INTO tasks (id, due, completed, data) VALUES (?, ?, ?, ?)", rows
+        ))
+
+    def update(self, task):
+        self._tasks[task.id] = task
+        task_id, due, completed, data = self._row(task)
+        self._submit("UPDATE tasks SET due = ?, completed = ?, data = ? WHERE id = ?", (due, completed, data, task_id))
+
+    def delete(self, task):
+        self._tasks.pop(task.id, None)
+        self._submit("DELETE FROM tasks WHERE id = ?", (task.id,))
+
+    def pending_due_between(self, start, end=None):
+        # Выборка идёт по задачам в памяти: запрос к базе не увидел бы правок, ещё стоящих
+        # в очереди записи, и ждал бы _lock, пока фоновый поток держит транзакцию
+        return pending_tasks_due_between(self._tasks.values(), start, end)
+
+    def overdue(self, now):
+        return self.pending_due_between(0, now)
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self):
+        pass
+
+    def close(self):
+        self.worker.call(self._close)
+
+    def _close(self):
+        with self._lock:
+            self._db.close()
+
+
+class TaskArchive:
+    # Выполненные задачи старше заданного срока дописываются в отдельный файл по строке на задачу.
+    # Файл читается только из окна архива и постранично: в памяти держатся лишь смещения строк
+    PAGE_SIZE = 50
+
+    def __init__(self, worker, path=ARCHIVE_FILE):
+        self.worker = worker
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = None
+
+    def append(self, tasks):
+        lines = "".join(json.dumps(task.to_dict(), ensure_ascii=False) + "\n" for task in tasks)
+        self.worker.call(functools.partial(self._append, lines.encode("utf-8")))
+
+    def _append(self, data):
+        with self._lock:
+            with open(self.path, "a+b") as f:
+                start = f.tell()
+                if start:
+                    # Недописанная строка от аварийного завершения не должна склеиться с новой
+                    f.seek(start - 1)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                        start += 1
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._offsets is not None:
+                self._offsets.append(start)
+                self._offsets.extend(start + i + 1 for i in self._newlines(data)[:-1])
+
+    @staticmethod
+    def _newlines(data):
+        positions = []
+        index = data.find(b"\n")
+        while index != -1:
+            positions.append(index)
+            index = data.find(b"\n", index + 1)
+        return positions
+
+    def _scan(self):
+        offsets = []
+        if os.path.exists(self.path):
+            position = 0
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        offsets.append(position)
+                    position += len(line)
+        self._offsets = offsets
+
+    def count(self):
+        with self._lock:
+            if self._offsets is None:
+                self._scan()
+            return len(self._offsets)
+
+    def page_count(self):
+        return -(-self.count() // self.PAGE_SIZE)
+
+    def page(self, number):
+        # Страницы идут от новых задач к старым
+        with self._lock:
+            if self._offsets is None:
+                self._scan()
+            end = len(self._offsets) - number * self.PAGE_SIZE
+            start = max(0, end - self.PAGE_SIZE)
+            if end <= 0:
+                return []
+            lines = []
+            with open(self.path, "rb") as f:
+                for offset in self._offsets[start:end]:
+                    f.seek(offset)
+                    lines.append(f.readline())
+        tasks = []
+        for line in reversed(lines):
+            try:
+                tasks.append(Task.from_dict(json.loads(line)))
+            except ValueError:
+                continue
+        return tasks
+
+
+class SearchIndex:
+    # Обратный индекс по словам описания; слова запроса ищутся как префиксы
+    # через отсортированный словарь, правки задач обновляют только их собственные слова
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.doc_tokens = {}
+
+    @classmethod
+    def tokenize(cls, text):
+        return set(cls.TOKEN_RE.findall(text.lower()))
+
+    def add(self, task):
+        tokens = frozenset(self.tokenize(task.description))
+        self.doc_tokens[task.id] = tokens
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                bisect.insort(self.vocabulary, token)
+            ids.add(task.id)
+
+    def remove(self, task):
+        for token in self.doc_tokens.pop(task.id, ()):
+            ids = self.postings[token]
+            ids.discard(task.id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _prefix_matches(self, prefix):
+        ids = set()
+        position = bisect.bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+            ids |= self.postings[self.vocabulary[position]]
+            position += 1
+        return ids
+
+    def search(self, query):
+        result = None
+        for prefix in sorted(self.tokenize(query), key=len, reverse=True):
+            ids = self._prefix_matches(prefix)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result if result is not None else set()
+
+    def matches(self, task, query):
+        tokens = self.doc_tokens.get(task.id, ())
+        return all(any(token.startswith(prefix) for token in tokens) for prefix in self.tokenize(query))
+
+
+class DeadlineScheduler:
+    # Ожидание дольше минуты не нужно: так планировщик сам поправляется после сна системы или перевода часов
+    MAX_WAIT = 60
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def schedule(self, key, when, kind, payload=None):
+        with self._cond:
+            seq = next(self._counter)
+            self._entries[key] = seq
+            heapq.heappush(self._heap, (when, seq, key, kind, payload))
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+
+    def cancel(self, key):
+        # Отмена ленивая: устаревшие записи отбрасываются, когда оказываются на вершине кучи
+        with self._cond:
+            self._entries.pop(key, None)
+
+    def _next_due(self):
+        while True:
+            while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+            delay = self._heap[0][0] - time()
+            if delay > 0:
+                self._cond.wait(min(delay, self.MAX_WAIT))
+                continue
+            when, seq, key, kind, payload = heapq.heappop(self._heap)
+            del self._entries[key]
+            return kind, payload
+
+    def _run(self):
+        while True:
+            with self._cond:
+                kind, payload = self._next_due()
+            try:
+                self.callback(kind, payload)
+            except Exception as e:
+                print(f"Ошибка обработки события планировщика: {e}")
+
+
+class UiDispatcher:
+    # Фоновые потоки не трогают виджеты: они ставят вызовы в очередь, а главный цикл Tk
+    # выполняет всё накопившееся за один проход
+    FRAME_MS = 16
+    IDLE_MS = 100
+    TRAY_IDLE_MS = 500
+    FRAME_BUDGET = 0.012
+
+    def __init__(self, root):
+        self.root = root
+        self.idle_ms = self.IDLE_MS
+        self._queue = queue.SimpleQueue()
+
+    def start(self):
+        self.root.after(self.idle_ms, self._drain)
+
+    def post(self, callback, *args):
+        self._queue.put((callback, args))
+
+    def _drain(self):
+        deadline = perf_counter() + self.FRAME_BUDGET
+        processed = 0
+        while perf_counter() < deadline:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Ошибка обработки события интерфейса: {e}")
+            processed += 1
+        try:
+            self.root.after(self.FRAME_MS if processed else self.idle_ms, self._drain)
+        except Exception:
+            pass
+
+
+class AudioEngine:
+    # Один долгоживущий поток воспроизведения с короткой очередью. Звук читается с диска один раз
+    # и дальше играется из памяти; повторные запросы в пределах MERGE_SECONDS сливаются в один
+    QUEUE_SIZE = 2
+    MERGE_SECONDS = 1.0
+
+    def __init__(self):
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._last_request = 0
+        self._thread = None
+        self._backend = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _submit(self, action, path):
+        try:
+            self._queue.put_nowait((action, path))
+        except queue.Full:
+            return False
+        self._start()
+        return True
+
+    def preload(self, path):
+        return self._submit("load", path)
+
+    def play(self, path):
+        now = perf_counter()
+        with self._lock:
+            if now - self._last_request < self.MERGE_SECONDS:
+                return False
+            self._last_request = now
+        return self._submit("play", path)
+
+    def _run(self):
+        while True:
+            action, path = self._queue.get()
+            try:
+                data = self._load(path)
+                if action == "play" and data is not None:
+                    self._play(path, data)
+            except Exception as e:
+                print(f"Ошибка воспроизведения звука: {e}")
+
+    def _load(self, path):
+        if path not in self._cache:
+            try:
+                with open(path, "rb") as f:
+                    self._cache[path] = f.read()
+            except OSError as e:
+                print(f"Не удалось загрузить звук {path}: {e}")
+                self._cache[path] = None
+        return self._cache[path]
+
+    def _play(self, path, data):
+        if self._backend is None:
+            try:
+                import winsound
+                self._backend = functools.partial(self._play_winsound, winsound)
+            except ImportError:
+                # Вне Windows воспроизведение из памяти недоступно, playsound открывает файл сам
+                from playsound import playsound
+                self._backend = lambda path, data: playsound(path)
+        self._backend(path, data)
+
+    @staticmethod
+    def _play_winsound(winsound, path, data):
+        winsound.PlaySound(data, winsound.SND_MEMORY | winsound.SND_NODEFAULT)
+
+
+class Toast:
+    def __init__(self, manager):
+        self.manager = manager
+        self.key = None
+        self.title = ""
+        self.count = 0
+        self.hide_job = None
+
+        self.window = ctk.CTkToplevel(manager.root)
+        self.window.withdraw()
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+        self.window.configure(fg_color="#2D2D2D", border_width=2, border_color="#444")
+
+        self.title_label = ctk.CTkLabel(self.window, text="", font=("Arial", 14, "bold"), text_color="white")
+        self.title_label.pack(pady=(10, 0))
+        self.message_label = ctk.CTkLabel(self.window, text="", wraplength=280, justify="left",
+                                          font=("Arial", 12), text_color="white")
+        self.message_label.pack(pady=5)
+
+        img_close = manager.app.img_close
+        close_btn = ctk.CTkButton(
+            self.window,
+            image=img_close if img_close else None,
+            text="×" if not img_close else "",
+            width=30,
+            height=30,
+            fg_color="transparent",
+            text_color="gray",
+            font=("Arial", 16),
+            command=lambda: self.manager.dismiss(self)
+        )
+        close_btn.place(relx=0.95, rely=0.1, anchor="ne")
+
+    def show(self, key, title, message, count):
+        self.key = key
+        self.title = title
+        self.count = count
+        self.message_label.configure(text=message)
+        self.update_title()
+        self.window.deiconify()
+
+    def update_title(self):
+        text = self.title if self.count == 1 else f"{self.title} (×{self.count})"
+        self.title_label.configure(text=text)
+
+    def hide(self):
+        if self.hide_job is not None:
+            self.window.after_cancel(self.hide_job)
+            self.hide_job = None
+        self.key = None
+        self.window.withdraw()
+
+
+class NotificationManager:
+    # Небольшой пул переиспользуемых окон, сложенных стопкой в углу экрана.
+    # Одинаковые сообщения сливаются в одно со счётчиком, лишние сверх лимита ждут в очереди
+    POOL_SIZE = 4
+    DISPLAY_MS = 3000
+    RATE_LIMIT = 3
+    WIDTH = 300
+    HEIGHT = 100
+    SPACING = 10
+
+    def __init__(self, app):
+        self.app = app
+        self.root = app.root
+        self.active = []
+        self.free = []
+        self.backlog = collections.deque(maxlen=50)
+        self.shown_at = collections.deque()
+        self.drain_job = None
+
+    def notify(self, title, message):
+        key = (title, message)
+        for toast in self.active:
+            if toast.key == key:
+                toast.count += 1
+                toast.update_title()
+                self._schedule_hide(toast)
+                return
+        for entry in self.backlog:
+            if entry[0] == key:
+                entry[3] += 1
+                return
+
+        if self._rate_limited():
+            self.backlog.append([key, title, message, 1])
+            self._schedule_drain()
+            return
+        self._show(key, title, message, 1)
+
+    def _rate_limited(self):
+        now = time()
+        while self.shown_at and now - self.shown_at[0] >= 1:
+            self.shown_at.popleft()
+        return len(self.shown_at) >= self.RATE_LIMIT
+
+    def _show(self, key, title, message, count):
+        if len(self.active) >= self.POOL_SIZE:
+            self._release(self.active[0])
+        toast = self.free.pop() if self.free else Toast(self)
+        self.active.append(toast)
+        toast.show(key, title, message, count)
+        self.shown_at.append(time())
+        self._schedule_hide(toast)
+        self._layout()
+
+    def _schedule_hide(self, toast):
+        if toast.hide_job is not None:
+            toast.window.after_cancel(toast.hide_job)
+        toast.hide_job = toast.window.after(self.DISPLAY_MS, lambda: self.dismiss(toast))
+
+    def _layout(self):
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = screen_width - self.WIDTH - 20
+        for slot, toast in enumerate(reversed(self.active)):
+            y = screen_height - self.HEIGHT - 50 - slot * (self.HEIGHT + self.SPACING)
+            toast.window.geometry(f"{self.WIDTH}x{self.HEIGHT}+{x}+{y}")
+
+    def _release(self, toast):
+        toast.hide()
+        self.active.remove(toast)
+        self.free.append(toast)
+
+    def dismiss(self, toast):
+        if toast in self.active:
+            self._release(toast)
+            self._layout()
+        self._drain()
+
+    def _schedule_drain(self):
+        if self.drain_job is None:
+            delay = 1 - (time() - self.shown_at[0]) if self.shown_at else 0
+            self.drain_job = self.root.after(max(int(delay * 1000), 50), self._drain)
+
+    def _drain(self):
+        self.drain_job = None
+        while self.backlog and not self._rate_limited():
+            key, title, message, count = self.backlog.popleft()
+            self._show(key, title, message, count)
+        if self.backlog:
+            self._schedule_drain()
+
+
+class Profiler:
+    # Режим --profile: cProfile на всё время работы и снимки tracemalloc в ключевых точках
+    TOP_FUNCTIONS = 40
+    TOP_ALLOCATIONS = 25
+    TRACEBACK_DEPTH = 10
+
+    def __init__(self, directory):
+        import cProfile
+
+        self.directory = directory
+        self.profile = cProfile.Profile()
+        self.snapshots = []
+        self.prefix = os.path.join(directory, datetime.now().strftime("lins_profile_%Y%m%d_%H%M%S"))
+
+    def start(self):
+        import tracemalloc
+
+        tracemalloc.start(self.TRACEBACK_DEPTH)
+        self.profile.enable()
+
+    def snapshot(self, label):
+        import tracemalloc
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+            ))
+            self.snapshots.append((label, snapshot))
+
+    def stop(self):
+        import tracemalloc
+
+        self.profile.disable()
+        tracemalloc.stop()
+
+    def write_reports(self):
+        import io
+        import pstats
+
+        stats_path = self.prefix + ".pstats"
+        self.profile.dump_stats(stats_path)
+
+        report_path = self.prefix + ".txt"
+        with open(report_path, "w", encoding="utf-8") as f:
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self.TOP_FUNCTIONS)
+            f.write(stream.getvalue())
+
+            previous = None
+            for label, snapshot in self.snapshots:
+                stats = snapshot.statistics("lineno")
+                total = sum(stat.size for stat in stats)
+                f.write(f"\n=== Память: {label} (всего {total / 1024:.1f} КиБ) ===\n")
+                for stat in stats[:self.TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+                if previous is not None:
+                    f.write(f"\n--- Прирост относительно «{previous[0]}» ---\n")
+                    for stat in snapshot.compare_to(previous[1], "lineno")[:self.TOP_ALLOCATIONS]:
+                        f.write(f"{stat}\n")
+                previous = (label, snapshot)
+        return [stats_path, report_path]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ProgressReader:
+    # Построчное чтение файла с подсчётом прочитанных байт для индикатора импорта
+    def __init__(self, path):
+        self.path = path
+        self.size = max(os.path.getsize(path), 1)
+        self.done = 0
+
+    def lines(self):
+        with open(self.path, "rb") as f:
+            for raw in f:
+                self.done += len(raw)
+                yield raw.decode("utf-8-sig" if self.done == len(raw) else "utf-8", errors="replace")
+
+    @property
+    def fraction(self):
+        return min(self.done / self.size, 1.0)
+
+
+CSV_FIELDS = ("id", "description", "due", "completed", "created", "recurrence")
+ICS_FREQUENCIES = {"daily": "DAILY", "weekly": "WEEKLY", "monthly": "MONTHLY"}
+
+
+def parse_external_timestamp(text):
+    # Кроме собственного формата принимается ISO 8601, в котором выгружают большинство программ
+    ts = parse_timestamp(text)
+    if ts is None and text:
+        try:
+            ts = int(datetime.fromisoformat(text.strip()).timestamp())
+        except ValueError:
+            return None
+    return ts
+
+
+def read_csv_tasks(lines):
+    for row in csv.DictReader(lines):
+        description = (row.get("description") or row.get("summary") or row.get("title") or "").strip()
+        if not description:
+            continue
+        due = parse_external_timestamp(row.get("due") or "")
+        completed = (row.get("completed") or "").strip().lower() in ("1", "true", "yes", "x", "да")
+        # Правило проверяется целиком: next_occurrence не должен получить «monthly:abc» или «monthly:40»
+        recurrence = (row.get("recurrence") or "").strip()
+        if due is None or not RECURRENCE_PATTERN.match(recurrence):
+            recurrence = None
+        elif recurrence == "monthly":
+            recurrence = recurrence_rule(recurrence, due)
+        yield Task(description, due, completed, parse_external_timestamp(row.get("created") or ""),
+                   row.get("id") or None, recurrence=recurrence)
+
+
+def write_csv_tasks(path, tasks):
+    with atomic_open(path, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(
+            (task.id, task.description, format_timestamp(task.due), int(task.completed),
+             format_timestamp(task.created), task.recurrence or "")
+            for task in tasks
+        )
+
+
+def _ics_unfold(lines):
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _ics_unescape(value):
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _ics_escape(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_timestamp(value):
+    # Формы YYYYMMDD, YYYYMMDDTHHMMSS и YYYYMMDDTHHMMSSZ; срезы заметно быстрее strptime на больших файлах
+    value = value.strip()
+    try:
+        moment = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        if value[8:9] == "T":
+            moment = moment.replace(hour=int(value[9:11]), minute=int(value[11:13]), second=int(value[13:15]))
+            if value.endswith("Z"):
+                moment = moment.replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return int(moment.timestamp())
+
+
+def read_ics_tasks(lines):
+    # Потоковый разбор: в памяти держатся свойства только текущего VTODO/VEVENT
+    props = None
+    for line in _ics_unfold(lines):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() in ("VTODO", "VEVENT"):
+            props = {}
+        elif name == "END" and value.upper() in ("VTODO", "VEVENT") and props is not None:
+            description = _ics_unescape(props.get("SUMMARY", "")).strip()
+            if description:
+                due = _ics_timestamp(props.get("DUE") or props.get("DTSTART") or "")
+                uid = props.get("UID", "")
+                rule = dict(part.partition("=")[::2] for part in props.get("RRULE", "").split(";") if part)
+                period = next((key for key, freq in ICS_FREQUENCIES.items() if freq == rule.get("FREQ")), None)
+                recurrence = None
+                if period and due is not None:
+                    recurrence = recurrence_rule(period, due)
+                    # BYMONTHDAY вне 1..31 (0, отрицательные дни) не понимает next_occurrence: берётся день срока
+                    if period == "monthly" and RECURRENCE_PATTERN.match(f"monthly:{rule.get('BYMONTHDAY', '')}"):
+                        recurrence = f"monthly:{rule['BYMONTHDAY']}"
+                yield Task(
+                    description,
+                    due,
+                    props.get("STATUS", "").upper() == "COMPLETED",
+                    _ics_timestamp(props.get("CREATED") or props.get("DTSTAMP") or ""),
+                    uid[:-len("@lins")] if uid.endswith("@lins") else (uid or None),
+                    recurrence=recurrence
+                )
+            props = None
+        elif props is not None:
+            props[name] = value
+
+
+def _ics_fold(line):
+    # Строки iCalendar ограничены 75 байтами; продолжение начинается с пробела
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while len(encoded) > limit:
+        cut = limit
+        while encoded[cut] & 0xC0 == 0x80:
+            # Не разрезать многобайтный символ UTF-8
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+        limit = 74
+    parts.append(encoded)
+    return b"\r\n ".join(parts).decode("utf-8") + "\r\n"
+
+
+def ics_lines(tasks):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Lins//Lins//RU\r\n"
+    for task in tasks:
+        lines = ["BEGIN:VTODO", f"UID:{task.id}@lins", f"DTSTAMP:{stamp}", f"SUMMARY:{_ics_escape(task.description)}"]
+        if task.due is not None:
+            lines.append(f"DUE:{datetime.fromtimestamp(task.due).strftime('%Y%m%dT%H%M%S')}")
+        if task.created is not None:
+            lines.append(f"CREATED:{datetime.fromtimestamp(task.created, timezone.utc).strftime('%Y%m%dT%H%M%SZ')}")
+        lines.append("STATUS:COMPLETED" if task.completed else "STATUS:NEEDS-ACTION")
+        if task.recurrence:
+            period, _, day = task.recurrence.partition(":")
+            lines.append(f"RRULE:FREQ={ICS_FREQUENCIES[period]}" + (f";BYMONTHDAY={day}" if day else ""))
+        lines.append("END:VTODO")
+        yield "".join(_ics_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+
+def write_ics_tasks(path, tasks):
+    with atomic_open(path, newline="") as f:
+        f.writelines(ics_lines(tasks))
+
+
+def lock_exclusive(f):
+    # Неблокирующая исключительная блокировка первого байта; ОС снимает её, когда процесс завершается
+    if os.name == "nt":
+        import msvcrt
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def instance_lock_path(path=INSTANCE_FILE):
+    return path + ".lock"
+
+
+class InstanceServer:
+    # Первая запущенная копия держит блокировку lins.instance.lock, слушает localhost на случайном
+    # порту и записывает порт и токен в lins.instance; повторный запуск и команда add отправляют
+    # ей одну строку JSON. Канал открывается до загрузки интерфейса, поэтому команды, пришедшие
+    # раньше обработчика, копятся и передаются ему в set_handler
+    def __init__(self, handler=None, path=INSTANCE_FILE):
+        self.handler = handler
+        self.path = path
+        self.token = secrets.token_hex(16)
+        self._socket = None
+        self._lock_file = None
+        self._handler_lock = threading.Lock()
+        self._pending = []
+
+    def start(self):
+        # False — блокировку держит другая копия; OSError — канал открыть не удалось
+        self._lock_file = open(instance_lock_path(self.path), "a")
+        try:
+            lock_exclusive(self._lock_file)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(8)
+        atomic_write(self.path, json.dumps({"port": self._socket.getsockname()[1], "token": self.token}))
+        threading.Thread(target=self._serve, daemon=True).start()
+        return True
+
+    def set_handler(self, handler):
+        with self._handler_lock:
+            self.handler = handler
+            pending, self._pending = self._pending, []
+        for request in pending:
+            try:
+                handler(request)
+            except Exception as e:
+                print(f"Ошибка команды от другой копии Lins: {e}")
+
+    def _dispatch(self, request):
+        with self._handler_lock:
+            handler = self.handler
+            if handler is None:
+                self._pending.append(request)
+                return
+        handler(request)
+
+    def _serve(self):
+        while True:
+            try:
+                connection, address = self._socket.accept()
+            except OSError:
+                return
+            with connection:
+                try:
+                    connection.settimeout(2)
+                    with connection.makefile("rwb") as stream:
+                        request = json.loads(stream.readline())
+                        if not isinstance(request, dict) or request.pop("token", None) != self.token:
+                            continue
+                        self._dispatch(request)
+                        stream.write(b"ok\n")
+                except Exception as e:
+                    # Ошибка одной команды не должна останавливать канал: следующий запуск снова получит ответ
+                    print(f"Ошибка команды от другой копии Lins: {e}")
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if json.load(f).get("token") == self.token:
+                    os.remove(self.path)
+        except (OSError, ValueError):
+            pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def send_to_instance(request, path=INSTANCE_FILE, timeout=0.5):
+    # True, если запущенная копия приняла команду; устаревший файл без живого сервера даёт False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as connection:
+            with connection.makefile("rwb") as stream:
+                stream.write(json.dumps(dict(request, token=info["token"]), ensure_ascii=False).encode("utf-8") + b"\n")
+                stream.flush()
+                return stream.readline().strip() == b"ok"
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def append_task_offline(task, settings_path=SETTINGS_FILE):
+    # Программа не запущена: задача дописывается прямо в хранилище, которое она откроет при запуске
+    backend = "json"
+    try:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            backend = json.load(f).get("storage", "json")
+    except (OSError, ValueError):
+        pass
+    if backend == "sqlite":
+        db = sqlite3.connect(DATABASE_FILE)
+        try:
+            db.executescript(SqliteTaskStorage.SCHEMA)
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO tasks (id, due, completed, data) VALUES (?, ?, ?, ?)",
+                    (task.id, task.due, int(task.completed), json.dumps(task.to_dict(), ensure_ascii=False))
+                )
+        finally:
+            db.close()
+    else:
+        with open_journal_for_append(JOURNAL_FILE) as f:
+            f.write(json.dumps({"op": "add", "task": task.to_dict()}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
 
 class TaskManagerApp:
     ASSETS_PATH = os.path.join(os.path.dirname(__file__), "assets")
     AUTO_START_KEY = "Lins_Task_Manager"
     DEFAULT_ALERT_SOUND = os.path.join(ASSETS_PATH, "alert.wav")
     DEFAULT_REPEAT_INTERVAL = 30
-
-    def __init__(self):
+    DEFAULT_WARN_BEFORE = 5
+    DEFAULT_ESCALATE_AFTER = 30
+    DEFAULT_SNOOZE = 10
+    SEARCH_INDEX_CHUNK = 2000
+    DEFAULT_ARCHIVE_AFTER_DAYS = 7
+    ARCHIVE_INTERVAL_MS = 60 * 60 * 1000
+
+    METRICS_DUMP_MS = 5 * 60 * 1000
+    TRAY_TEARDOWN_MS = 2000
+    IMPORT_BATCH = 2000
+    CARD_RENDERERS = {"widgets": "Виджеты", "canvas": "Холст"}
+
+    def __init__(self, profiler=None, instance=None):
+        self.profiler = profiler
+        self.instance = instance
+        self.metrics = Metrics()
         self.root = ctk.CTk()
         self.root.title("Lins - ваш менеджер задач")
         self.root.geometry("839x600")
         self.root.resizable(True, True)
 
+        self.dispatcher = UiDispatcher(self.root)
+        self.dispatcher.start()
+        self.watchdog = LagWatchdog(self.root, self.metrics)
+        self.watchdog.start()
+
         icon_path = os.path.join(self.ASSETS_PATH, "icon.ico")
         if os.path.exists(icon_path):
             self.root.iconbitmap(icon_path)
@@ -40,12 +2362,27 @@ class TaskManagerApp:
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        self.tasks = []
+        self.persistence = PersistenceWorker(self.metrics)
+        self.audio = AudioEngine()
+        self.audio.preload(self.alert_sound)
+        self.archive = TaskArchive(self.persistence)
+        self.store = TaskStore()
+        self.views = TaskViews()
+        self.views_job = None
+        self.search_index = None
+        self.search_index_backlog = []
+        self.search_query = ""
+        self.filtered_tasks = {}
+        self.filtered_sections = None
         self.load_tasks()
+        self.schedule_views_advance()
 
         self.start_background_monitor()
 
         self.icon = None
+        self.tray_job = None
+        self.menu_move_job = None
+        self.tray_mode = False
         self.notifications_enabled = True
 
         self.img_complete = None
@@ -55,79 +2392,106 @@ class TaskManagerApp:
         self.img_update = None
         self.img_about = None
         self.img_close = None
-        self.load_images()
+        self.notifications = NotificationManager(self)
+        self.description_tip = DescriptionTip(self.root)
 
         self.setup_ui()
-        self.update_task_list()
 
         self.root.bind("<Unmap>", self.on_minimize)
         self.root.bind("<Map>", self.on_restore)
 
-        self.create_tray_icon()
+        # Окно и строка ввода показываются сразу, остальное достраивается по шагам в простое главного цикла
+        self.startup_timings = {}
+        self.startup_stages = [
+            self.load_task_images_and_render,
+            self.setup_calendar,
+            self.setup_tray,
+            self.load_images,
+            self.archive_completed_tasks,
+            self.build_search_index
+        ]
+        self.root.after_idle(self.run_startup_stage)
+        self.profile_snapshot("запуск")
+
+    def profile_snapshot(self, label):
+        if self.profiler:
+            self.profiler.snapshot(label)
+
+    def run_startup_stage(self):
+        if not self.startup_timings:
+            self.root.update_idletasks()
+            self.startup_timings["first_frame_ms"] = round((perf_counter() - STARTUP_TIME) * 1000, 1)
+
+        stage = self.startup_stages.pop(0)
+        try:
+            stage()
+        except Exception as e:
+            print(f"Ошибка при запуске ({stage.__name__}): {e}")
 
-        tray_thread = threading.Thread(target=self.run_tray, daemon=True)
-        tray_thread.start()
+        if self.startup_stages:
+            self.root.after(1, self.run_startup_stage)
+        else:
+            self.startup_timings["ready_ms"] = round((perf_counter() - STARTUP_TIME) * 1000, 1)
+            self.root.after(self.METRICS_DUMP_MS, self.schedule_metrics_dump)
 
-    def load_images(self):
-        try:
-            # Основные иконки задач
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "complete.png")):
-                self.img_complete = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "complete.png")),
-                    size=(20, 20)
-                )
-            else:
-                print("Файл: assets/complete.png не найден")
+    def dump_metrics(self):
+        self.persistence.call(functools.partial(
+            self.metrics.dump, METRICS_LOG_FILE, {"startup": dict(self.startup_timings)}
+        ))
 
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "delete.png")):
-                self.img_delete = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "delete.png")),
-                    size=(20, 20)
-                )
-            else:
-                print("Файл: assets/delete.png не найден")
+    def schedule_metrics_dump(self):
+        self.dump_metrics()
+        self.root.after(self.METRICS_DUMP_MS, self.schedule_metrics_dump)
 
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "pending.png")):
-                self.img_pending = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "pending.png")),
-                    size=(20, 20)
-                )
-            else:
-                print("Файл: assets/pending.png не найден")
+    def load_task_images_and_render(self):
+        self.img_complete = self.load_image("complete.png", (20, 20))
+        self.img_delete = self.load_image("delete.png", (20, 20))
+        self.img_pending = self.load_image("pending.png", (20, 20))
+        with self.metrics.timer("update_task_list"):
+            self.task_grid.resume()
+        self.profile_snapshot("первая отрисовка")
 
-            # Иконки для меню
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "settings.png")):
-                self.img_settings = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "settings.png")),
-                    size=(16, 16)
-                )
-            else:
-                print("Файл: assets/settings.png не найден")
+    def setup_calendar(self):
+        from tkcalendar import DateEntry
 
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "update.png")):
-                self.img_update = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "update.png")),
-                    size=(16, 16)
-                )
-            else:
-                print("Файл: assets/update.png не найден")
+        placeholder = self.date_entry
+        self.date_entry = DateEntry(self.input_frame, date_pattern='dd.mm.yyyy',
+                                  background='#333333', foreground='white',
+                                  selectbackground='#444444', selectforeground='white',
+                                  normalbackground='#333333', normalforeground='white',
+                                  weekendbackground='#333333', weekendforeground='white',
+                                  headersbackground='#2B2B2B', headersforeground='white',
+                                  bordercolor='#444444', arrowcolor='white',
+                                  disabledbackground='#2B2B2B', disabledforeground='#666666')
+        try:
+            self.date_entry.set_date(datetime.strptime(placeholder.get(), "%d.%m.%Y"))
+        except ValueError:
+            pass
+        placeholder.destroy()
+        self.date_entry.grid(row=0, column=1, padx=5, pady=5)
 
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "about.png")):
-                self.img_about = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "about.png")),
-                    size=(16, 16)
-                )
-            else:
-                print("Файл: assets/about.png не найден")
+    def setup_tray(self):
+        self.create_tray_icon()
 
-            if os.path.exists(os.path.join(self.ASSETS_PATH, "close.png")):
-                self.img_close = ctk.CTkImage(
-                    Image.open(os.path.join(self.ASSETS_PATH, "close.png")),
-                    size=(16, 16)
-                )
-            else:
-                print("Файл: assets/close.png не найден")
+        tray_thread = threading.Thread(target=self.run_tray, daemon=True)
+        tray_thread.start()
+
+    def load_image(self, name, size):
+        from PIL import Image
 
+        path = os.path.join(self.ASSETS_PATH, name)
+        if not os.path.exists(path):
+            print(f"Файл: assets/{name} не найден")
+            return None
+        return ctk.CTkImage(Image.open(path), size=size)
+
+    def load_images(self):
+        # Иконки меню и уведомлений не нужны для первого кадра и загружаются последними
+        try:
+            self.img_settings = self.load_image("settings.png", (16, 16))
+            self.img_update = self.load_image("update.png", (16, 16))
+            self.img_about = self.load_image("about.png", (16, 16))
+            self.img_close = self.load_image("close.png", (16, 16))
         except Exception as e:
             print(f"Ошибка загрузки изображений: {e}")
 
@@ -135,7 +2499,14 @@ class TaskManagerApp:
         self.notifications_enabled = True
         self.repeat_interval = self.DEFAULT_REPEAT_INTERVAL
         self.sound_enabled = True
+        self.alert_sound = self.DEFAULT_ALERT_SOUND
+        self.warn_before = self.DEFAULT_WARN_BEFORE
+        self.escalate_after = self.DEFAULT_ESCALATE_AFTER
+        self.snooze_interval = self.DEFAULT_SNOOZE
         self.autostart_enabled = False
+        self.storage_backend = "json"
+        self.card_renderer = "widgets"
+        self.archive_after_days = self.DEFAULT_ARCHIVE_AFTER_DAYS
 
         self.autostart_enabled = self.is_auto_start_enabled()
 
@@ -147,6 +2518,13 @@ class TaskManagerApp:
                 self.notifications_enabled = settings.get("notifications_enabled", True)
                 self.repeat_interval = settings.get("repeat_interval", self.DEFAULT_REPEAT_INTERVAL)
                 self.sound_enabled = settings.get("sound_enabled", True)
+                self.alert_sound = settings.get("alert_sound") or self.DEFAULT_ALERT_SOUND
+                self.warn_before = settings.get("warn_before", self.DEFAULT_WARN_BEFORE)
+                self.escalate_after = settings.get("escalate_after", self.DEFAULT_ESCALATE_AFTER)
+                self.snooze_interval = settings.get("snooze_interval", self.DEFAULT_SNOOZE)
+                self.storage_backend = settings.get("storage", "json")
+                self.card_renderer = settings.get("card_renderer", "widgets")
+                self.archive_after_days = settings.get("archive_after_days", self.DEFAULT_ARCHIVE_AFTER_DAYS)
 
                 saved_autostart = settings.get("autostart_enabled", None)
                 if saved_autostart is not None and saved_autostart != self.autostart_enabled:
@@ -165,7 +2543,7 @@ class TaskManagerApp:
 
         self.menu_popup = ctk.CTkToplevel(self.root)
         self.menu_popup.title("")
-        self.menu_popup.geometry("200x115+{}+{}".format(
+        self.menu_popup.geometry("200x220+{}+{}".format(
             self.root.winfo_x() + self.root.winfo_width() - 210,
             self.root.winfo_y() + 50
         ))
@@ -199,6 +2577,36 @@ class TaskManagerApp:
             text_color="white"
         ).pack(fill="x", pady=2)
 
+        ctk.CTkButton(
+            menu_frame,
+            text=" Архив",
+            anchor="w",
+            command=lambda: self.open_archive_window(),
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white"
+        ).pack(fill="x", pady=2)
+
+        ctk.CTkButton(
+            menu_frame,
+            text=" Импорт...",
+            anchor="w",
+            command=lambda: self.choose_import_file(),
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white"
+        ).pack(fill="x", pady=2)
+
+        ctk.CTkButton(
+            menu_frame,
+            text=" Экспорт...",
+            anchor="w",
+            command=lambda: self.choose_export_file(),
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white"
+        ).pack(fill="x", pady=2)
+
         ctk.CTkButton(
             menu_frame,
             image=self.img_about,
@@ -210,6 +2618,10 @@ class TaskManagerApp:
             text_color="white"
         ).pack(fill="x", pady=2)
 
+        # Скрытая панель отладки открывается правым щелчком по меню
+        for widget in [self.menu_popup, menu_frame] + menu_frame.winfo_children():
+            widget.bind("<Button-3>", lambda e: self.open_debug_window())
+
         self.menu_popup.bind("<FocusOut>", lambda e: self.close_menu())
         self.root.bind("<Button-1>", self.on_click_outside_menu)
         self.root.bind("<Configure>", self.on_window_move)
@@ -243,19 +2655,16 @@ class TaskManagerApp:
     def setup_ui(self):
         input_frame = ctk.CTkFrame(self.root, fg_color="#2B2B2B")
         input_frame.pack(pady=10, padx=20, fill="x")
+        self.input_frame = input_frame
 
         self.task_entry = ctk.CTkEntry(input_frame, placeholder_text="Описание задачи...", width=300,
                                      fg_color="#333333", border_color="#444", text_color="white")
         self.task_entry.grid(row=0, column=0, padx=5, pady=5)
 
-        self.date_entry = DateEntry(input_frame, date_pattern='dd.mm.yyyy',
-                                  background='#333333', foreground='white',
-                                  selectbackground='#444444', selectforeground='white',
-                                  normalbackground='#333333', normalforeground='white',
-                                  weekendbackground='#333333', weekendforeground='white',
-                                  headersbackground='#2B2B2B', headersforeground='white',
-                                  bordercolor='#444444', arrowcolor='white',
-                                  disabledbackground='#2B2B2B', disabledforeground='#666666')
+        # Простое поле с сегодняшней датой; календарь tkcalendar подменяет его после первого кадра
+        self.date_entry = ctk.CTkEntry(input_frame, width=100, fg_color="#333333", border_color="#444",
+                                       text_color="white")
+        self.date_entry.insert(0, datetime.now().strftime("%d.%m.%Y"))
         self.date_entry.grid(row=0, column=1, padx=5, pady=5)
 
         time_frame = ctk.CTkFrame(input_frame, fg_color="#2B2B2B")
@@ -276,43 +2685,45 @@ class TaskManagerApp:
         ctk.CTkLabel(time_frame, text=":", text_color="white").pack(side="left", padx=2)
         self.minute_spinbox.pack(side="left")
 
+        self.recurrence_var = ctk.StringVar(value="Однократно")
+        self.recurrence_combo = ctk.CTkComboBox(input_frame, values=["Однократно"] + list(RECURRENCE_TITLES.values()),
+                                                variable=self.recurrence_var, width=130, fg_color="#333333",
+                                                button_color="#444444", button_hover_color="#555555",
+                                                text_color="white")
+        self.recurrence_combo.grid(row=0, column=3, padx=5, pady=5)
+
         self.add_button = ctk.CTkButton(input_frame, text="Добавить задачу", command=self.add_task,
                                       fg_color="#444444", hover_color="#555555", text_color="white")
-        self.add_button.grid(row=0, column=3, padx=10)
+        self.add_button.grid(row=0, column=4, padx=10)
 
         self.menu_button = ctk.CTkButton(input_frame, text="⋯", width=40, command=self.open_menu,
                                        fg_color="#444444", hover_color="#555555", text_color="white")
-        self.menu_button.grid(row=0, column=4, padx=5)
+        self.menu_button.grid(row=0, column=5, padx=5)
+
+        self.search_var = ctk.StringVar()
+        self.search_entry = ctk.CTkEntry(input_frame, placeholder_text="Поиск...", textvariable=self.search_var,
+                                         fg_color="#333333", border_color="#444", text_color="white")
+        self.search_entry.grid(row=1, column=0, columnspan=6, padx=5, pady=(0, 5), sticky="ew")
+        self.search_var.trace_add("write", lambda *args: self.on_search_changed())
 
         list_frame = ctk.CTkFrame(self.root, fg_color="#2B2B2B")
         list_frame.pack(pady=10, padx=20, fill="both", expand=True)
 
         self.canvas = ctk.CTkCanvas(list_frame, bg="#2B2B2B", highlightthickness=0)
-        self.scrollbar = ctk.CTkScrollbar(list_frame, orientation="vertical", command=self.canvas.yview,
+        self.scrollbar = ctk.CTkScrollbar(list_frame, orientation="vertical",
                                         fg_color="#2B2B2B", button_color="#444444", button_hover_color="#555555")
-        self.scrollable_frame = ctk.CTkFrame(self.canvas, fg_color="transparent")
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw", tags="frame")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.scrollable_frame.grid_columnconfigure(0, weight=3)
-        self.scrollable_frame.grid_columnconfigure(1, weight=2)
-        self.scrollable_frame.grid_columnconfigure(2, weight=1)
-        self.scrollable_frame.grid_columnconfigure(3, weight=1)
 
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
 
-        list_frame.grid_rowconfigure(0, weight=1)
-        list_frame.grid_columnconfigure(0, weight=1)
+        # Карточки создаются только для видимой области холста и переиспользуются при прокрутке
+        self.task_grid = VirtualTaskGrid(self.canvas, self.scrollbar, self, self.displayed_sections,
+                                         self.card_class())
 
         self.canvas.bind("<MouseWheel>", self._on_mousewheel)
-        self.scrollable_frame.bind("<MouseWheel>", self._on_mousewheel)
+
+    def card_class(self):
+        return CanvasTaskCard if self.card_renderer == "canvas" else TaskCard
 
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
@@ -327,193 +2738,299 @@ class TaskManagerApp:
             messagebox.showwarning("Предупреждение", "Введите описание задачи!")
             return
 
-        try:
-            due_datetime = f"{date_str} {hour}:{minute}"
-            datetime.strptime(due_datetime, "%d.%m.%Y %H:%M")
-        except ValueError:
+        due = parse_timestamp(f"{date_str} {hour}:{minute}")
+        if due is None:
             messagebox.showwarning("Ошибка", "Некорректная дата или время!")
             return
 
-        task = {
-            "description": description,
-            "due": due_datetime,
-            "completed": False,
-            "created": datetime.now().strftime("%d.%m.%Y %H:%M")
-        }
+        period = next((key for key, title in RECURRENCE_TITLES.items() if title == self.recurrence_var.get()), None)
+        recurrence = recurrence_rule(period, due) if period else None
 
-        self.tasks.append(task)
+        self.insert_task(Task(description, due, created=int(time()), recurrence=recurrence))
         self.task_entry.delete(0, "end")
-        self.update_task_list()
 
-        self.show_notification("Задача добавлена", f"Вы добавили: {description[:30]}...")
+    def insert_task(self, task):
+        self.store.apply(put=(task,))
+        self.views.add(task, time())
+        self.storage.add(task)
+        self.compact_tasks_if_needed()
+        if self.search_index is not None:
+            self.search_index.add(task)
+            if self.search_query and self.search_index.matches(task, self.search_query):
+                self.filtered_tasks[task.id] = task
+                self.filtered_sections = None
+        self.task_grid.task_inserted()
+        self.arm_task(task)
+        self.schedule_views_advance()
+
+        self.show_notification("Задача добавлена", f"Вы добавили: {task.description[:30]}...")
+
+    def choose_import_file(self):
+        from tkinter import filedialog
 
-    def update_task_list(self):
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        if not self.tasks:
-            placeholder = ctk.CTkLabel(
-                self.scrollable_frame,
-                text="Нет задач.\nДобавьте новую!",
-                text_color="gray",
-                font=("Arial", 14),
-                justify="center"
-            )
-            placeholder.grid(row=0, column=0, columnspan=3, pady=20)
-            return
-
-        for i in range(4):
-            self.scrollable_frame.grid_columnconfigure(i, weight=1)
+        self.close_menu()
+        path = filedialog.askopenfilename(
+            parent=self.root,
+            title="Импорт задач",
+            filetypes=[("Задачи", "*.csv *.ics"), ("CSV", "*.csv"), ("iCalendar", "*.ics")]
+        )
+        if path:
+            self.import_tasks(path)
 
-        for idx, task in enumerate(self.tasks):
-            row = idx // 4
-            col = idx % 4
+    def choose_export_file(self):
+        from tkinter import filedialog
 
-            desc = task["description"]
-            due = task["due"]
-            created = task.get("created", "")
-            completed = task["completed"]
+        self.close_menu()
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Экспорт задач",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("iCalendar", "*.ics")]
+        )
+        if path:
+            self.export_tasks(path)
 
-            now = datetime.now()
+    def import_tasks(self, path):
+        # Файл читается генератором порциями по IMPORT_BATCH в простое главного цикла; разделы,
+        # список и сжатие хранилища обновляются один раз в конце
+        try:
+            reader = ProgressReader(path)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось открыть файл импорта: {e}")
+            return
+        parse = read_ics_tasks if path.lower().endswith(".ics") else read_csv_tasks
+        batches = batched(parse(reader.lines()), self.IMPORT_BATCH)
+
+        window = ctk.CTkToplevel(self.root)
+        window.title("Импорт")
+        window.attributes("-topmost", True)
+        window.configure(fg_color="#333333")
+        self.center_window_on_parent(window, 320, 100)
+        label = ctk.CTkLabel(window, text="Импорт задач...", text_color="white")
+        label.pack(pady=(15, 5))
+        progress = ctk.CTkProgressBar(window, width=280)
+        progress.set(0)
+        progress.pack(pady=5)
+
+        imported = []
+        start = perf_counter()
+
+        def step():
             try:
-                due_dt = datetime.strptime(due, "%d.%m.%Y %H:%M")
-            except ValueError:
-                due_dt = now
-
-            fg_color = "#FF4C4C" if now > due_dt and not completed else "white"
-
-            task_frame = ctk.CTkFrame(self.scrollable_frame, fg_color="#333333", corner_radius=10)
-            task_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            task_frame.grid_columnconfigure(0, weight=1)
-
-            desc_label = ctk.CTkLabel(
-                task_frame,
-                text=desc,
-                anchor="w",
-                justify="left",
-                wraplength=220,
-                text_color=fg_color,
-                font=("Arial", 14, "bold")
-            )
-            desc_label.pack(anchor="w", padx=10, pady=(8, 4))
-
-            due_label = ctk.CTkLabel(
-                task_frame,
-                text=f"Срок: {due}",
-                anchor="w",
-                text_color=fg_color,
-                font=("Arial", 12)
-            )
-            due_label.pack(anchor="w", padx=10)
-
-            created_label = ctk.CTkLabel(
-                task_frame,
-                text=f"Создано: {created}",
-                anchor="w",
-                text_color="gray",
-                font=("Arial", 10)
-            )
-            created_label.pack(anchor="w", padx=10, pady=(0, 8))
-
-            status_frame = ctk.CTkFrame(task_frame, fg_color="transparent")
-            status_frame.pack(fill="x", padx=10, pady=(0, 8))
+                batch = next(batches, None)
+            except Exception as e:
+                # Уже прочитанные порции остаются в хранилище, поэтому завершение выполняется и при ошибке
+                messagebox.showerror("Ошибка", f"Не удалось импортировать задачи: {e}")
+                batch = None
+            if batch:
+                fresh = [task for task in batch if task.id not in self.store]
+                self.store.apply(put=fresh)
+                if self.search_index is not None:
+                    for task in fresh:
+                        self.search_index.add(task)
+                self.storage.add_many(fresh)
+                imported.extend(fresh)
+                if window.winfo_exists():
+                    progress.set(reader.fraction)
+                    label.configure(text=f"Импортировано: {len(imported)}")
+                self.root.after(1, step)
+                return
+            if window.winfo_exists():
+                window.destroy()
+            self.finish_import(imported)
+            self.metrics.record("import", (perf_counter() - start) * 1000)
+
+        self.root.after(1, step)
+
+    def finish_import(self, imported):
+        self.views.rebuild(self.store.values(), time())
+        if self.search_query and self.search_index is not None:
+            self.filtered_tasks = self.matching_tasks(self.search_index.search(self.search_query))
+        self.filtered_sections = None
+        now = time()
+        for task in imported:
+            if task.due is not None and task.due >= now - self.alert_policy.escalate_after:
+                self.arm_task(task)
+        self.compact_tasks_if_needed()
+        self.schedule_views_advance()
+        self.update_task_list()
+        self.show_notification("Импорт завершён", f"Добавлено задач: {len(imported)}")
 
-            if self.img_complete and self.img_pending:
-                status_img = self.img_complete if completed else self.img_pending
-                status_label = ctk.CTkLabel(status_frame, image=status_img, text="")
-            else:
-                status_text = "✅ Выполнено" if completed else "🕒 В процессе"
-                status_color = "green" if completed else "orange"
-                status_label = ctk.CTkLabel(status_frame, text=status_text, text_color=status_color)
-            status_label.pack(anchor="w")
-
-            action_frame = ctk.CTkFrame(task_frame, fg_color="transparent")
-            action_frame.pack(fill="x", padx=10, pady=(4, 8))
-
-            if not completed:
-                complete_btn = ctk.CTkButton(
-                    action_frame,
-                    image=self.img_complete if self.img_complete else None,
-                    text="Выполнить" if not self.img_complete else "",
-                    width=60,
-                    height=25,
-                    fg_color="#444444",
-                    hover_color="#555555",
-                    text_color="white",
-                    font=("Arial", 12),
-                    command=lambda i=idx: self.complete_task(i)
-                )
-                complete_btn.pack(side="left", padx=4)
-
-            delete_btn = ctk.CTkButton(
-                action_frame,
-                image=self.img_delete if self.img_delete else None,
-                text="Удалить" if not self.img_delete else "",
-                width=60,
-                height=25,
-                fg_color="#444444",
-                hover_color="#555555",
-                text_color="white",
-                font=("Arial", 12),
-                command=lambda i=idx: self.delete_task(i)
-            )
-            delete_btn.pack(side="left", padx=4)
+    def export_tasks(self, path):
+        # Фоновый поток получает свою копию списка задач; строки формируются генератором
+        tasks = list(self.store.values())
+        write = write_ics_tasks if path.lower().endswith(".ics") else write_csv_tasks
 
-    def complete_task(self, idx):
-        self.tasks[idx]["completed"] = True
+        def job():
+            try:
+                write(path, tasks)
+            except Exception as e:
+                self.dispatcher.post(messagebox.showerror, "Ошибка", f"Не удалось экспортировать задачи: {e}")
+                return
+            self.dispatcher.post(self.show_notification, "Экспорт завершён", f"Сохранено задач: {len(tasks)}")
+
+        self.persistence.call(job)
+
+    def on_instance_command(self, request):
+        # Вызывается из потока сервера; изменения выполняются в главном цикле
+        if request.get("cmd") == "show":
+            self.dispatcher.post(self.on_tray_click, None, None)
+        elif request.get("cmd") == "add":
+            data = request.get("task")
+            if not isinstance(data, dict):
+                raise ValueError("команда add без задачи")
+            task = Task.from_dict(data)
+            self.dispatcher.post(self.insert_task, task)
+
+    @timed("update_task_list")
+    def update_task_list(self):
+        self.task_grid.invalidate()
+
+    def displayed_sections(self):
+        if not self.search_query:
+            return self.views.sections()
+        if self.filtered_sections is None:
+            self.filtered_sections = self.views.sections(self.filtered_tasks.values())
+        return self.filtered_sections
+
+    def schedule_views_advance(self):
+        # Один таймер на ближайший переход между разделами; после каждого изменения перевзводится
+        if self.views_job is not None:
+            self.root.after_cancel(self.views_job)
+        delay = min(max(self.views.next_transition() - time(), 0), 3600)
+        self.views_job = self.root.after(int(delay * 1000) + 50, self.advance_views)
+
+    @timed("views_advance")
+    def advance_views(self):
+        self.views_job = None
+        moved = self.views.advance(time())
+        if moved:
+            self.filtered_sections = None
+            for task in moved:
+                self.task_grid.task_changed(task)
+        self.schedule_views_advance()
+
+    def build_search_index(self):
+        # Индекс строится порциями в простое после запуска, дальше обновляется только в add_task и delete_task
+        if self.search_index is None:
+            self.search_index = SearchIndex()
+            self.search_index_backlog = list(self.store.values())
+        chunk = self.search_index_backlog[-self.SEARCH_INDEX_CHUNK:]
+        del self.search_index_backlog[-self.SEARCH_INDEX_CHUNK:]
+        for task in chunk:
+            self.search_index.add(task)
+        if self.search_index_backlog:
+            self.root.after(1, self.build_search_index)
+
+    def ensure_search_index(self):
+        if self.search_index is None or self.search_index_backlog:
+            with self.metrics.timer("search_index_build"):
+                if self.search_index is None:
+                    self.search_index = SearchIndex()
+                    self.search_index_backlog = list(self.store.values())
+                for task in self.search_index_backlog:
+                    self.search_index.add(task)
+                self.search_index_backlog = []
+        return self.search_index
+
+    @timed("search")
+    def on_search_changed(self):
+        query = self.search_var.get().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        if query:
+            ids = self.ensure_search_index().search(query)
+            self.filtered_tasks = self.matching_tasks(ids)
+        else:
+            self.filtered_tasks = {}
+        self.filtered_sections = None
+        self.canvas.yview_moveto(0)
         self.update_task_list()
-        task_desc = self.tasks[idx]["description"]
-        self.show_notification("Задача выполнена", f" {task_desc[:30]}...")
 
-    def delete_task(self, idx):
-        task_desc = self.tasks[idx]["description"]
-        del self.tasks[idx]
-        self.update_task_list()
-        self.show_notification("Задача удалена", f" {task_desc[:30]}...")
+    def matching_tasks(self, ids):
+        return {task_id: self.store.get(task_id) for task_id in ids if task_id in self.store}
+
+    def commit_task(self, old, new):
+        # Новый объект задачи заменяет старый в хранилище, разделах, поиске и на карточке
+        self.store.apply(put=(new,))
+        self.views.remove(old)
+        self.views.add(new, time())
+        if new.id in self.filtered_tasks:
+            self.filtered_tasks[new.id] = new
+        self.filtered_sections = None
+        self.storage.update(new)
+        self.compact_tasks_if_needed()
+        self.task_grid.task_changed(new)
+        self.arm_task(new)
+        return new
+
+    def complete_task(self, task_id):
+        task = self.store.get(task_id)
+        if task is None:
+            return
+        now = time()
+        if task.recurrence:
+            task = self.commit_task(task, task.rolled_forward(now))
+        else:
+            task = self.commit_task(task, task.replace(completed=True, completed_at=int(now)))
+        self.schedule_views_advance()
+        task_desc = task.description
+        if task.recurrence:
+            self.show_notification("Задача выполнена", f" {task_desc[:30]}...\nСледующий срок: {format_timestamp(task.due)}")
+        else:
+            self.show_notification("Задача выполнена", f" {task_desc[:30]}...")
+
+    def delete_task(self, task_id):
+        task = self.store.get(task_id)
+        if task is None:
+            return
+        self.forget_tasks([task])
+        self.compact_tasks_if_needed()
+        self.task_grid.task_removed(task)
+        self.show_notification("Задача удалена", f" {task.description[:30]}...")
+
+    def forget_tasks(self, tasks):
+        # Убирает задачи из рабочего набора, затем из разделов, поиска и планировщика
+        self.store.apply(remove=[task.id for task in tasks])
+        for task in tasks:
+            self.views.remove(task)
+            if self.search_index is not None:
+                self.search_index.remove(task)
+            if self.filtered_tasks.pop(task.id, None) is not None:
+                self.filtered_sections = None
+            self.storage.delete(task)
+            self.scheduler.cancel(task.id)
+
+    @timed("archive")
+    def archive_completed_tasks(self):
+        # Архив дописывается в очереди фоновой записи раньше удалений из хранилища,
+        # поэтому при сбое задача может оказаться в обоих местах, но не потеряется
+        if self.archive_after_days > 0:
+            # Старая история, которую хранилище оставило на диске при загрузке, переносится без показа в списке
+            unloaded = self.storage.take_archivable()
+            if unloaded:
+                self.archive.append(unloaded)
+                for task in unloaded:
+                    self.storage.delete(task)
+            cutoff = time() - self.archive_after_days * 86400
+            stale = [task for task in self.views.buckets["completed"]
+                     if (task.completed_at or task.due or 0) < cutoff]
+            if stale:
+                self.archive.append(stale)
+                self.forget_tasks(stale)
+                self.compact_tasks_if_needed()
+                self.task_grid.update()
+        self.root.after(self.ARCHIVE_INTERVAL_MS, self.archive_completed_tasks)
 
     def show_notification(self, title="Уведомление", message=""):
         if not self.notifications_enabled:
             return
-
-        notify = ctk.CTkToplevel(self.root)
-        notify.overrideredirect(True)
-        notify.attributes("-topmost", True)
-        notify.configure(fg_color="#2D2D2D", border_width=2, border_color="#444")
-
-        width = 300
-        height = 100
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        x = screen_width - width - 20
-        y = screen_height - height - 50
-
-        notify.geometry(f"{width}x{height}+{x}+{y}")
-
-        ctk.CTkLabel(notify, text=title, font=("Arial", 14, "bold"), text_color="white").pack(pady=(10, 0))
-        ctk.CTkLabel(notify, text=message, wraplength=280, justify="left", font=("Arial", 12), text_color="white").pack(pady=5)
-
-        close_btn = ctk.CTkButton(
-            notify,
-            image=self.img_close if self.img_close else None,
-            text="×" if not self.img_close else "",
-            width=30,
-            height=30,
-            fg_color="transparent",
-            text_color="gray",
-            font=("Arial", 16),
-            command=lambda: notify.destroy()
-        )
-        close_btn.place(relx=0.95, rely=0.1, anchor="ne")
-
-        notify.after(3000, lambda: self.safe_destroy(notify))
-
-    def safe_destroy(self, window):
-        try:
-            window.destroy()
-        except:
-            pass
+        self.notifications.notify(title, message)
 
     def create_tray_image(self):
+        from PIL import Image, ImageDraw
+
         width = 64
         height = 64
         color1 = "#333333"
@@ -526,14 +3043,20 @@ class TaskManagerApp:
         return image
 
     def create_tray_icon(self):
+        import pystray
+
         image = self.create_tray_image()
         menu = pystray.Menu(
-            pystray.MenuItem('Показать', self.on_tray_click),
-            pystray.MenuItem('Закрыть', self.on_tray_exit),
+            pystray.MenuItem('Показать', self._from_tray(self.on_tray_click)),
+            pystray.MenuItem('Закрыть', self._from_tray(self.on_tray_exit)),
             pystray.MenuItem('Уведомления', self.toggle_notifications, checked=lambda item: self.notifications_enabled)
         )
         self.icon = pystray.Icon("Lins", image, "Lins", menu)
 
+    def _from_tray(self, handler):
+        # Меню трея вызывается из потока pystray, поэтому обработчик выполняется в главном цикле Tk
+        return lambda icon, item: self.dispatcher.post(handler, icon, item)
+
     def run_tray(self):
         self.icon.run()
 
@@ -542,21 +3065,77 @@ class TaskManagerApp:
             self.root.withdraw()
             if self.icon:
                 self.icon.visible = True
+            # Разбор интерфейса откладывается, чтобы быстрое сворачивание и разворачивание его не дёргало
+            if self.tray_job is None and not self.tray_mode:
+                self.tray_job = self.root.after(self.TRAY_TEARDOWN_MS, self.enter_tray_mode)
 
     def on_restore(self, event):
+        # <Map> приходит и от дочерних виджетов, в том числе пересозданных при разборе интерфейса в трее
+        if event.widget is not self.root:
+            return
         if self.root.state() != 'iconic':
             self.root.deiconify()
-            self.icon.visible = False
+            if self.icon:
+                self.icon.visible = False
+            self.leave_tray_mode()
 
     def on_tray_click(self, icon, item):
         self.root.deiconify()
         self.root.state('normal')
         self.root.lift()
-        self.icon.visible = False
+        if self.icon:
+            self.icon.visible = False
+        self.leave_tray_mode()
+
+    @timed("tray_teardown")
+    def enter_tray_mode(self):
+        # В трее остаются только модель задач, планировщик и уведомления; виджеты списка,
+        # календарь и вспомогательные окна уничтожаются и создаются заново при разворачивании
+        self.tray_job = None
+        if self.root.state() not in ('withdrawn', 'iconic'):
+            return
+        self.tray_mode = True
+        # В трее никто не смотрит на задержку главного цикла, а очередь событий проверяется реже:
+        # процесс просыпается дважды в секунду вместо четырнадцати
+        self.watchdog.stop()
+        self.dispatcher.idle_ms = UiDispatcher.TRAY_IDLE_MS
+        self.task_grid.teardown()
+        for name in ('menu_popup', 'settings_window', 'about_window', 'archive_window', 'debug_window'):
+            window = getattr(self, name, None)
+            if window is not None and window.winfo_exists():
+                window.destroy()
+        if not isinstance(self.date_entry, ctk.CTkEntry):
+            date = self.date_entry.get()
+            self.date_entry.destroy()
+            self.date_entry = ctk.CTkEntry(self.input_frame, width=100, fg_color="#333333", border_color="#444",
+                                           text_color="white")
+            self.date_entry.insert(0, date)
+            self.date_entry.grid(row=0, column=1, padx=5, pady=5)
+        gc.collect()
+
+    @timed("tray_restore")
+    def leave_tray_mode(self):
+        if self.tray_job is not None:
+            self.root.after_cancel(self.tray_job)
+            self.tray_job = None
+        if not self.tray_mode:
+            return
+        self.tray_mode = False
+        self.dispatcher.idle_ms = UiDispatcher.IDLE_MS
+        self.watchdog.start()
+        self.task_grid.resume()
+        try:
+            self.setup_calendar()
+        except Exception as e:
+            print(f"Ошибка при восстановлении календаря: {e}")
 
     def on_tray_exit(self, icon, item):
+        if self.instance:
+            self.instance.stop()
         self.save_settings()
+        self.dump_metrics()
         self.save_tasks()
+        self.profile_snapshot("закрытие")
         self.icon.stop()
         self.root.quit()
         self.root.destroy()
@@ -565,21 +3144,45 @@ class TaskManagerApp:
         self.notifications_enabled = not self.notifications_enabled
         icon.update_menu()
 
+    @timed("save_tasks")
     def save_tasks(self):
+        # Все изменения уже в журнале: при выходе остаётся закрыть его и дождаться фоновой записи
         try:
-            with open(TASKS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=4)
+            self.storage.close()
+            self.persistence.flush()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить задачи: {e}")
 
+    def compact_tasks_if_needed(self):
+        if self.storage.needs_compaction():
+            try:
+                self.storage.compact()
+            except Exception as e:
+                print(f"Не удалось начать сжатие журнала задач: {e}")
+
+    @timed("load_tasks")
     def load_tasks(self):
-        if os.path.exists(TASKS_FILE):
+        self.storage = None
+        if self.storage_backend == "sqlite":
             try:
-                with open(TASKS_FILE, "r", encoding="utf-8") as f:
-                    self.tasks = json.load(f)
+                # Выполненные задачи старше срока архивации не загружаются: в памяти им нечего делать
+                completed_since = None
+                if self.archive_after_days > 0:
+                    completed_since = int(time()) - self.archive_after_days * 86400
+                self.storage = SqliteTaskStorage(self.persistence, completed_since=completed_since)
             except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось загрузить задачи: {e}")
-                self.tasks = []
+                print(f"Не удалось открыть базу задач, используется {TASKS_FILE}: {e}")
+        if self.storage is None:
+            self.storage = JsonTaskStorage(self.persistence)
+
+        try:
+            # Задачи из старых версий получают постоянный идентификатор в Task.from_dict
+            tasks = self.storage.load()
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось загрузить задачи: {e}")
+            tasks = []
+        self.store = TaskStore(tasks)
+        self.views.rebuild(tasks, time())
 
     def get_window_state(self):
         is_zoomed = self.root.wm_state() == 'zoomed'
@@ -602,6 +3205,7 @@ class TaskManagerApp:
             "state": state
         }
 
+    @timed("save_settings")
     def save_settings(self):
         window_state = self.get_window_state()
 
@@ -614,16 +3218,21 @@ class TaskManagerApp:
             "notifications_enabled": self.notifications_enabled,
             "repeat_interval": self.repeat_interval,
             "sound_enabled": self.sound_enabled,
-            "autostart_enabled": self.autostart_enabled
+            "alert_sound": None if self.alert_sound == self.DEFAULT_ALERT_SOUND else self.alert_sound,
+            "warn_before": self.warn_before,
+            "escalate_after": self.escalate_after,
+            "snooze_interval": self.snooze_interval,
+            "autostart_enabled": self.autostart_enabled,
+            "storage": self.storage_backend,
+            "card_renderer": self.card_renderer,
+            "archive_after_days": self.archive_after_days
         }
 
-        try:
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(settings, f, indent=4)
-        except Exception as e:
-            print(f"Не удалось сохранить настройки в файл: {e}")
+        self.persistence.write_json(SETTINGS_FILE, settings, indent=4)
 
         try:
+            import winreg
+
             reg_key = winreg.OpenKey(
                 winreg.HKEY_CURRENT_USER,
                 r"Software\Microsoft\Windows\CurrentVersion\Run",
@@ -647,10 +3256,14 @@ class TaskManagerApp:
             messagebox.showerror("Ошибка автозапуска", f"Не удалось обновить автозапуск: {e}")
 
     def on_closing(self):
+        if self.instance:
+            self.instance.stop()
         if self.icon:
             self.icon.stop()
         self.save_settings()
+        self.dump_metrics()
         self.save_tasks()
+        self.profile_snapshot("закрытие")
         self.root.quit()
         if hasattr(self, 'settings_window') and self.settings_window.winfo_exists():
             self.settings_window.destroy()
@@ -680,6 +3293,13 @@ class TaskManagerApp:
                 self.close_menu()
 
     def on_window_move(self, event):
+        # <Configure> приходит от каждого виджета окна; меню переставляется не чаще раза за кадр
+        if event.widget is not self.root or self.menu_move_job is not None:
+            return
+        self.menu_move_job = self.root.after(16, self.move_menu)
+
+    def move_menu(self):
+        self.menu_move_job = None
         if hasattr(self, 'menu_popup') and self.menu_popup.winfo_exists():
             self.menu_popup.geometry("+{}+{}".format(
                 self.root.winfo_x() + self.root.winfo_width() - 210,
@@ -690,7 +3310,7 @@ class TaskManagerApp:
         self.close_menu()
         if hasattr(self, 'settings_window') and self.settings_window.winfo_exists():
             self.settings_window.focus()
-            self.center_window_on_parent(self.settings_window, 350, 300)
+            self.center_window_on_parent(self.settings_window, 350, 600)
             return
 
         self.settings_window = ctk.CTkToplevel(self.root)
@@ -700,7 +3320,7 @@ class TaskManagerApp:
         self.settings_window.resizable(False, False)
         self.settings_window.overrideredirect(True)
         self.settings_window.configure(fg_color="#333333", border_width=2, border_color="#555")
-        self.center_window_on_parent(self.settings_window, 350, 350)
+        self.center_window_on_parent(self.settings_window, 350, 600)
 
         title_label = ctk.CTkLabel(self.settings_window, text="Настройки", font=("Arial", 16, "bold"),
                                    text_color="white")
@@ -742,6 +3362,29 @@ class TaskManagerApp:
         else:
             sound_switch.deselect()
 
+        def choose_sound():
+            from tkinter import filedialog
+
+            path = filedialog.askopenfilename(
+                parent=self.settings_window,
+                title="Звук уведомления",
+                filetypes=[("WAV", "*.wav")]
+            )
+            if path:
+                self.alert_sound = path
+                self.audio.preload(path)
+                sound_button.configure(text=f"🔔 {os.path.basename(path)}")
+
+        sound_button = ctk.CTkButton(
+            self.settings_window,
+            text=f"🔔 {os.path.basename(self.alert_sound)}",
+            command=choose_sound,
+            fg_color="#444444",
+            hover_color="#555555",
+            text_color="white"
+        )
+        sound_button.pack(pady=5)
+
         ctk.CTkLabel(self.settings_window, text="Интервал (мин):", text_color="white", font=("Arial", 12)).pack(
             pady=(10, 2))
         interval_var = ctk.StringVar(value=str(self.repeat_interval))
@@ -753,6 +3396,42 @@ class TaskManagerApp:
         )
         interval_combo.pack(pady=5)
 
+        ctk.CTkLabel(self.settings_window, text="Архивировать выполненные через (дн.):", text_color="white",
+                     font=("Arial", 12)).pack(pady=(10, 2))
+        archive_var = ctk.StringVar(value=str(self.archive_after_days))
+        archive_combo = ctk.CTkComboBox(
+            self.settings_window,
+            values=["1", "3", "7", "14", "30", "90"],
+            variable=archive_var,
+            width=100
+        )
+        archive_combo.pack(pady=5)
+
+        ctk.CTkLabel(self.settings_window, text="Отрисовка карточек:", text_color="white",
+                     font=("Arial", 12)).pack(pady=(10, 2))
+        renderer_var = ctk.StringVar(value=self.CARD_RENDERERS.get(self.card_renderer, "Виджеты"))
+        renderer_combo = ctk.CTkComboBox(
+            self.settings_window,
+            values=list(self.CARD_RENDERERS.values()),
+            variable=renderer_var,
+            width=130
+        )
+        renderer_combo.pack(pady=5)
+
+        ctk.CTkLabel(self.settings_window, text="Оповещения (мин): до срока / просрочка / отложить",
+                     text_color="white", font=("Arial", 12)).pack(pady=(10, 2))
+        alert_frame = ctk.CTkFrame(self.settings_window, fg_color="transparent")
+        alert_frame.pack(pady=5)
+        warn_var = ctk.StringVar(value=str(self.warn_before))
+        escalate_var = ctk.StringVar(value=str(self.escalate_after))
+        snooze_var = ctk.StringVar(value=str(self.snooze_interval))
+        for variable, values in (
+            (warn_var, ["1", "5", "10", "15", "30", "60"]),
+            (escalate_var, ["10", "30", "60", "120", "240"]),
+            (snooze_var, ["5", "10", "15", "30", "60"])
+        ):
+            ctk.CTkComboBox(alert_frame, values=values, variable=variable, width=70).pack(side="left", padx=3)
+
         def toggle_autostart():
             self.autostart_enabled = not self.autostart_enabled
             autostart_switch.configure(text="Автозапуск: Вкл" if self.autostart_enabled else "Автозапуск: Выкл")
@@ -777,6 +3456,23 @@ class TaskManagerApp:
                 self.repeat_interval = int(interval_var.get())
             except:
                 pass
+            try:
+                self.archive_after_days = max(int(archive_var.get()), 0)
+            except ValueError:
+                pass
+            try:
+                self.warn_before = max(int(warn_var.get()), 0)
+                self.escalate_after = max(int(escalate_var.get()), 1)
+                self.snooze_interval = max(int(snooze_var.get()), 1)
+            except ValueError:
+                pass
+            self.card_renderer = next(
+                (key for key, title in self.CARD_RENDERERS.items() if title == renderer_var.get()), "widgets"
+            )
+            self.task_grid.set_card_class(self.card_class())
+            self.update_alert_policy()
+            self.arm_pending_tasks()
+            self.arm_reminder()
 
         save_btn = ctk.CTkButton(
             self.settings_window,
@@ -815,8 +3511,7 @@ class TaskManagerApp:
 
         ctk.CTkLabel(update_window, text="🔍 Проверка обновлений...", font=("Arial", 14), text_color="white").pack(pady=20)
 
-        def simulate_check():
-            sleep(1.5)
+        def show_result():
             try:
                 for widget in update_window.winfo_children():
                     widget.destroy()
@@ -834,6 +3529,10 @@ class TaskManagerApp:
             except:
                 pass
 
+        def simulate_check():
+            sleep(1.5)
+            self.dispatcher.post(show_result)
+
         threading.Thread(target=simulate_check, daemon=True).start()
 
     def open_about_window(self):
@@ -874,6 +3573,98 @@ class TaskManagerApp:
 
         self.root.bind("<Button-1>", lambda e: self.close_if_outside(self.about_window, e))
 
+    def open_archive_window(self):
+        self.close_menu()
+        if hasattr(self, 'archive_window') and self.archive_window.winfo_exists():
+            self.archive_window.focus()
+            return
+
+        self.archive_window = ctk.CTkToplevel(self.root)
+        self.archive_window.title("Архив")
+        self.archive_window.attributes("-topmost", True)
+        self.archive_window.configure(fg_color="#333333")
+        self.center_window_on_parent(self.archive_window, 460, 480)
+
+        listing = ctk.CTkScrollableFrame(self.archive_window, fg_color="#2B2B2B")
+        listing.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        nav_frame = ctk.CTkFrame(self.archive_window, fg_color="transparent")
+        nav_frame.pack(fill="x", padx=10, pady=(0, 10))
+        prev_btn = ctk.CTkButton(nav_frame, text="←", width=40, command=lambda: show(current["page"] - 1),
+                                 fg_color="#444444", hover_color="#555555", text_color="white")
+        prev_btn.pack(side="left")
+        page_label = ctk.CTkLabel(nav_frame, text="", text_color="white")
+        page_label.pack(side="left", expand=True)
+        next_btn = ctk.CTkButton(nav_frame, text="→", width=40, command=lambda: show(current["page"] + 1),
+                                 fg_color="#444444", hover_color="#555555", text_color="white")
+        next_btn.pack(side="right")
+
+        current = {"page": 0}
+
+        def show(page):
+            # С диска читается только открытая страница
+            pages = self.archive.page_count()
+            page = max(0, min(page, pages - 1))
+            current["page"] = page
+            for widget in listing.winfo_children():
+                widget.destroy()
+            tasks = self.archive.page(page)
+            if not tasks:
+                ctk.CTkLabel(listing, text="Архив пуст", text_color="gray").pack(pady=20)
+            for task in tasks:
+                ctk.CTkLabel(
+                    listing,
+                    text=f"{task.description}\nСрок: {format_timestamp(task.due)}   "
+                         f"Выполнено: {format_timestamp(task.completed_at) or '—'}",
+                    anchor="w",
+                    justify="left",
+                    wraplength=400,
+                    text_color="white"
+                ).pack(fill="x", anchor="w", padx=5, pady=3)
+            page_label.configure(text=f"Страница {page + 1} из {max(pages, 1)}")
+            prev_btn.configure(state="normal" if page > 0 else "disabled")
+            next_btn.configure(state="normal" if page + 1 < pages else "disabled")
+
+        show(0)
+
+    def open_debug_window(self):
+        self.close_menu()
+        if hasattr(self, 'debug_window') and self.debug_window.winfo_exists():
+            self.debug_window.focus()
+            return
+
+        self.debug_window = ctk.CTkToplevel(self.root)
+        self.debug_window.title("Отладка")
+        self.debug_window.attributes("-topmost", True)
+        self.debug_window.configure(fg_color="#333333")
+        self.center_window_on_parent(self.debug_window, 560, 400)
+
+        text = ctk.CTkTextbox(self.debug_window, fg_color="#2B2B2B", text_color="white", font=("Consolas", 11))
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        button_frame = ctk.CTkFrame(self.debug_window, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+        ctk.CTkButton(button_frame, text="Записать в журнал", command=self.dump_metrics,
+                      fg_color="#444444", hover_color="#555555", text_color="white").pack(side="left")
+        ctk.CTkButton(button_frame, text="Закрыть", command=self.debug_window.destroy,
+                      fg_color="#444444", hover_color="#555555", text_color="white").pack(side="right")
+
+        def refresh():
+            if not self.debug_window.winfo_exists():
+                return
+            lines = [f"Запуск: {self.startup_timings}", f"Задач: {len(self.store)}", ""]
+            lines.append(f"{'таймер':<20}{'вызовов':>9}{'сред':>10}{'p50':>10}{'p95':>10}{'макс':>10}")
+            for name, stat in sorted(self.metrics.snapshot().items()):
+                lines.append(f"{name:<20}{stat['count']:>9}{stat['avg_ms']:>10.2f}{stat['p50_ms']:>10.2f}"
+                             f"{stat['p95_ms']:>10.2f}{stat['max_ms']:>10.2f}")
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", "\n".join(lines))
+            text.configure(state="disabled")
+            self.debug_window.after(1000, refresh)
+
+        refresh()
+
     def close_if_outside(self, window, event):
         if not window.winfo_exists():
             return
@@ -892,49 +3683,87 @@ class TaskManagerApp:
         window.geometry(f"{width}x{height}+{x}+{y}")
 
     def play_sound(self):
-        if self.sound_enabled and os.path.exists(self.DEFAULT_ALERT_SOUND):
-            try:
-                from playsound import playsound
-                threading.Thread(target=playsound, args=(self.DEFAULT_ALERT_SOUND,), daemon=True).start()
-            except Exception as e:
-                print(f"Ошибка воспроизведения звука: {e}")
+        if self.sound_enabled:
+            self.audio.play(self.alert_sound)
 
     def start_background_monitor(self):
+        self.scheduler = DeadlineScheduler(lambda kind, payload: self.dispatcher.post(self.on_deadline, kind, payload))
+        self.update_alert_policy()
+        self.arm_pending_tasks()
+        self.arm_reminder()
+        self.scheduler.start()
+
+    def arm_pending_tasks(self):
+        # Планируются невыполненные задачи, у которых ещё может сработать переход; давно просроченные
+        # задачи остаются в разделе «Просрочено» и не поднимают волну оповещений при запуске.
+        # Отложенное оповещение повторяется в snoozed_until при любом сроке задачи
+        since = int(time()) - self.alert_policy.escalate_after
+        for task in self.storage.pending_due_between(since):
+            self.arm_task(task)
+        for task in self.store.values():
+            if task.snoozed_until is not None and not task.completed and task.due is not None and task.due < since:
+                self.arm_task(task)
+
+    def update_alert_policy(self):
+        self.alert_policy = AlertPolicy(self.warn_before * 60, self.escalate_after * 60, self.snooze_interval * 60)
+
+    def arm_task(self, task):
+        step = self.alert_policy.next_alert(task, time())
+        if step is None:
+            self.scheduler.cancel(task.id)
+            return
+        # В планировщик уходит только идентификатор: к моменту срабатывания задача может смениться новой версией
+        self.scheduler.schedule(task.id, step[1], "alert", task.id)
 
-        def monitor():
-            last_notify_time = datetime.now()
-            while True:
-                now = datetime.now()
-
-                for task in self.tasks:
-                    if not task["completed"]:
-                        try:
-                            due_dt = datetime.strptime(task["due"], "%d.%m.%Y %H:%M")
-                            if (due_dt - now).total_seconds() <= 300 and (due_dt - now).total_seconds() > 0:
-                                self.show_notification(
-                                    "Срок истекает!",
-                                    f"⚠️ Задача скоро истечёт:\n{task['description'][:30]}..."
-                                )
-                                self.play_sound()
-                        except:
-                            pass
-
-                if self.repeat_interval > 0:
-                    if (now - last_notify_time).total_seconds() >= self.repeat_interval * 60:
-                        self.show_notification(
-                            "Напоминание",
-                            f"⏰ Прошло {self.repeat_interval} минут."
-                        )
-                        self.play_sound()
-                        last_notify_time = now
-
-                sleep(10)
-
-        thread = threading.Thread(target=monitor, daemon=True)
-        thread.start()
+    def snooze_task(self, task_id):
+        task = self.store.get(task_id)
+        if task is None or task.completed:
+            return
+        self.commit_task(task, task.replace(snoozed_until=int(time()) + self.alert_policy.snooze))
+
+    def arm_reminder(self):
+        if self.repeat_interval > 0:
+            self.scheduler.schedule("reminder", time() + self.repeat_interval * 60, "reminder")
+        else:
+            self.scheduler.cancel("reminder")
+
+    @timed("monitor_pass")
+    def on_deadline(self, kind, payload):
+        if kind == "alert":
+            self.fire_alert(payload)
+        elif kind == "reminder":
+            self.show_notification(
+                "Напоминание",
+                f"⏰ Прошло {self.repeat_interval} минут."
+            )
+            self.play_sound()
+            self.arm_reminder()
+
+    def fire_alert(self, task_id):
+        # Состояние оповещения сохраняется вместе с задачей, поэтому после перезапуска переход не повторяется
+        task = self.store.get(task_id)
+        if task is None:
+            return
+        step = self.alert_policy.next_alert(task, time())
+        if step is None or step[1] > time():
+            self.arm_task(task)
+            return
+        state = step[0]
+        task = self.commit_task(task, task.replace(alert=state, snoozed_until=None))
+
+        description = task.description[:30]
+        if state == "warned":
+            self.show_notification("Срок истекает!", f"⚠️ Задача скоро истечёт:\n{description}...")
+        elif state == "due":
+            self.show_notification("Срок наступил", f"⏰ {description}...")
+        elif state == "overdue":
+            self.show_notification("Задача просрочена", f"❗ {description}...")
+        self.play_sound()
 
     def is_auto_start_enabled(self):
         try:
+            import winreg
+
             reg_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Run", 0,
                                      winreg.KEY_READ)
             try:
@@ -950,6 +3779,8 @@ class TaskManagerApp:
 
     def set_auto_start(self, enable: bool):
         try:
+            import winreg
+
             reg_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Run", 0,
                                      winreg.KEY_WRITE)
             if enable:
@@ -970,6 +3801,8 @@ class TaskManagerApp:
             messagebox.showerror("Ошибка автозапуска", f"Не удалось изменить автозапуск: {e}")
 
     def create_tray_image(self):
+        from PIL import Image, ImageDraw
+
         icon_path = os.path.join(self.ASSETS_PATH, "tray_icon.png")
         if os.path.exists(icon_path):
             return Image.open(icon_path)
@@ -982,6 +3815,78 @@ class TaskManagerApp:
             return image
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Lins", description="Lins - менеджер задач")
+    parser.add_argument("--profile", action="store_true",
+                        help="запустить под cProfile и tracemalloc, отчёты пишутся рядом с tasks.json")
+    commands = parser.add_subparsers(dest="command")
+    add_parser = commands.add_parser("add", help="добавить задачу без открытия окна")
+    add_parser.add_argument("description")
+    add_parser.add_argument("--due", required=True, help='срок в формате "дд.мм.гггг ЧЧ:ММ"')
+    add_parser.add_argument("--repeat", choices=sorted(RECURRENCE_TITLES), help="повторять задачу")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        return run_add_command(args)
+
+    # Блокировка берётся до загрузки интерфейса, поэтому из двух одновременных запусков окно
+    # создаёт только один; второй просит его показать себя и завершается
+    instance = InstanceServer()
+    try:
+        if not instance.start():
+            for _ in range(20):
+                if send_to_instance({"cmd": "show"}):
+                    break
+                sleep(0.25)
+            return 0
+    except OSError as e:
+        print(f"Не удалось открыть канал для других копий Lins: {e}")
+        instance.stop()
+        instance = None
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler(os.path.dirname(os.path.abspath(TASKS_FILE)))
+        profiler.start()
+
+    load_ui()
+    app = TaskManagerApp(profiler, instance)
+    if instance:
+        instance.set_handler(app.on_instance_command)
+    app.run()
+
+    if profiler:
+        profiler.stop()
+        print(f"Отчёты профилирования: {', '.join(profiler.write_reports())}")
+
+
+def run_add_command(args):
+    due = parse_timestamp(args.due)
+    if due is None:
+        print(f"Некорректный срок: {args.due}", file=sys.stderr)
+        return 2
+    recurrence = recurrence_rule(args.repeat, due) if args.repeat else None
+    task = Task(args.description.strip(), due, created=int(time()), recurrence=recurrence)
+    request = {"cmd": "add", "task": task.to_dict()}
+    if send_to_instance(request):
+        return 0
+    # Запись в хранилище мимо программы допустима только под той же блокировкой, что держит
+    # запущенная копия: иначе строка может лечь в журнал уже после того, как стартующая копия его прочитала
+    with open(instance_lock_path(), "a") as lock:
+        for _ in range(40):
+            try:
+                lock_exclusive(lock)
+            except OSError:
+                # Копия запущена или запускается: её канал вот-вот откроется
+                if send_to_instance(request):
+                    return 0
+                sleep(0.25)
+                continue
+            append_task_offline(task)
+            return 0
+    print("Запущенная копия Lins не отвечает, задача не добавлена", file=sys.stderr)
+    return 1
+
+
 if __name__ == "__main__":
-    app = TaskManagerApp()
-    app.run()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""Замеры горячих путей Lins: загрузка, отрисовка, планировщик и сохранение задач.
+
+Запуск:
+    python benchmark.py --sizes 100 10000 100000 --output benchmark.json
+
+Отрисовке нужен дисплей; на машине без него используйте виртуальный:
+    xvfb-run -a python benchmark.py
+
+Без дисплея замер отрисовки пропускается, остальные пути выполняются без окна.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import types
+from time import perf_counter, time
+
+try:
+    import winreg  # noqa: F401
+except ImportError:
+    # Автозапуск через реестр есть только в Windows; для замеров достаточно пустого модуля
+    sys.modules["winreg"] = types.ModuleType("winreg")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import Lins
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+WORDS = ("отчёт", "звонок", "встреча", "письмо", "оплата", "проект", "ревью", "релиз",
+         "план", "задача", "клиент", "сервер", "бюджет", "договор", "презентация")
+
+
+def generate_tasks(count, seed=0):
+    rng = random.Random(seed)
+    now = int(time())
+    tasks = []
+    for _ in range(count):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+        due = now + rng.randint(-30, 60) * 86400 + rng.randint(0, 1440) * 60
+        task = Lins.Task(description, due, rng.random() < 0.2, due - rng.randint(1, 30) * 86400)
+        tasks.append(task.to_dict())
+    return tasks
+
+
+def write_tasks_file(directory, count):
+    path = os.path.join(directory, Lins.TASKS_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(generate_tasks(count), f, ensure_ascii=False, indent=4)
+    return path
+
+
+def measure(run, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = perf_counter()
+        run(state)
+        samples.append((perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "repeat": repeat
+    }
+
+
+class BenchmarkContext:
+    # Временный каталог с tasks.json на count задач; удаляется на выходе из with, когда фоновая
+    # запись, общая для всех размеров, дописала в него всё поставленное
+    def __init__(self, count, worker):
+        self.count = count
+        self.worker = worker
+        self._temp = tempfile.TemporaryDirectory(prefix=f"lins-bench-{count}-")
+        self.directory = self._temp.name
+        self.tasks_path = write_tasks_file(self.directory, count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.worker.flush()
+        self._temp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def json_storage(self):
+        return Lins.JsonTaskStorage(self.worker, self.tasks_path, self.path(Lins.JOURNAL_FILE))
+
+    def loaded_storage(self):
+        storage = self.json_storage()
+        storage.load()
+        return storage
+
+
+def bench_load(ctx, repeat):
+    def run(_):
+        storage = ctx.json_storage()
+        storage.load()
+        storage.close()
+        ctx.worker.flush()
+
+    return measure(run, repeat)
+
+
+class MonitorHost:
+    # Путь монитора без окна: fire_alert и arm_task те же, что у TaskManagerApp; commit_task
+    # обновляет хранилище, разделы, журнал и планировщик, но не трогает карточки и поиск
+    fire_alert = Lins.TaskManagerApp.fire_alert
+    arm_task = Lins.TaskManagerApp.arm_task
+
+    def __init__(self, tasks, storage, policy):
+        self.storage = storage
+        self.alert_policy = policy
+        self.store = Lins.TaskStore(tasks)
+        self.views = Lins.TaskViews()
+        self.views.rebuild(tasks, time())
+        self.scheduler = Lins.DeadlineScheduler(lambda kind, payload: None)
+
+    def commit_task(self, old, new):
+        self.store.apply(put=(new,))
+        self.views.remove(old)
+        self.views.add(new, time())
+        self.storage.update(new)
+        self.arm_task(new)
+        return new
+
+    def show_notification(self, title="Уведомление", message=""):
+        pass
+
+    def play_sound(self):
+        pass
+
+
+def bench_monitor(ctx, repeat):
+    storage = ctx.loaded_storage()
+    app = Lins.TaskManagerApp
+    policy = Lins.AlertPolicy(app.DEFAULT_WARN_BEFORE * 60, app.DEFAULT_ESCALATE_AFTER * 60, app.DEFAULT_SNOOZE * 60)
+    now = int(time())
+    # Каждый повтор начинает с исходных задач: журнал к этому времени уже хранит новые состояния
+    tasks = list(storage._tasks.values())
+    # Задачи, у которых переход оповещения уже наступил: каждый fire_alert сохраняет новое состояние
+    firing = [task.id for task in storage.pending_due_between(0, now)][:100]
+
+    def seed(_):
+        # Построение кучи сроков при запуске: выборка невыполненных задач и постановка в планировщик
+        scheduler = Lins.DeadlineScheduler(lambda kind, task: None)
+        now = int(time())
+        for task in storage.pending_due_between(now - policy.escalate_after):
+            step = policy.next_alert(task, now)
+            if step is not None:
+                scheduler.schedule(task.id, step[1], "alert", task.id)
+
+    def tick(host):
+        # Срабатывания монитора так, как их выполняет главный цикл: новое состояние задачи,
+        # запись в журнал и постановка следующего перехода в планировщик
+        for task_id in firing:
+            host.fire_alert(task_id)
+
+    results = {"seed": measure(seed, repeat)}
+    if firing:
+        results["fire_alert_x100"] = measure(tick, repeat, lambda: MonitorHost(tasks, storage, policy))
+    storage.close()
+    ctx.worker.flush()
+    return results
+
+
+def bench_save(ctx, repeat):
+    storage = ctx.loaded_storage()
+    tasks = list(storage._tasks.values())
+
+    def snapshot(_):
+        storage._write_snapshot([task.to_dict() for task in tasks])
+
+    def journal(_):
+        for task in tasks[:1000]:
+            storage.update(task)
+        ctx.worker.flush()
+
+    results = {
+        "snapshot": measure(snapshot, repeat),
+        "journal_append_x1000": measure(journal, repeat)
+    }
+    storage.close()
+    ctx.worker.flush()
+    return results
+
+
+class RenderHost:
+    # Минимальная замена TaskManagerApp для VirtualTaskGrid: без трея, планировщика и хранилища
+    img_complete = None
+    img_delete = None
+    img_pending = None
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.metrics = Lins.Metrics()
+
+    def complete_task(self, task_id):
+        pass
+
+    def delete_task(self, task_id):
+        pass
+
+    def snooze_task(self, task_id):
+        pass
+
+    def _on_mousewheel(self, event):
+        pass
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def bench_render(ctx, repeat, renderer="widgets"):
+    ctk = Lins.load_ui()
+    card_class = Lins.CanvasTaskCard if renderer == "canvas" else Lins.TaskCard
+
+    storage = ctx.loaded_storage()
+    tasks = list(storage._tasks.values())
+
+    views = Lins.TaskViews()
+    views.rebuild(tasks, time())
+
+    root = ctk.CTk()
+    root.geometry("839x600")
+    canvas = ctk.CTkCanvas(root, bg="#2B2B2B", highlightthickness=0)
+    scrollbar = ctk.CTkScrollbar(root, orientation="vertical")
+    canvas.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+    root.update()
+
+    host = RenderHost(canvas)
+    grid = Lins.VirtualTaskGrid(canvas, scrollbar, host, views.sections, card_class)
+
+    def first_render(_):
+        grid.resume()
+        root.update_idletasks()
+
+    def full_render(_):
+        grid.invalidate()
+        root.update_idletasks()
+
+    def scroll(_):
+        for step in range(20):
+            canvas.yview_moveto(step / 20)
+            grid.refresh()
+            root.update_idletasks()
+
+    results = {
+        "first_render": measure(first_render, 1),
+        "update_task_list": measure(full_render, repeat),
+        "scroll_x20": measure(scroll, repeat),
+        "grid": {name: stat for name, stat in host.metrics.snapshot().items()
+                 if name in ("grid_update", "grid_refresh")},
+        "cards": len(grid.cards) + len(grid.pool),
+        "tk_objects": count_widgets(root) + len(canvas.find_all())
+    }
+    root.destroy()
+    storage.close()
+    ctx.worker.flush()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры горячих путей Lins")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--skip-render", action="store_true")
+    args = parser.parse_args(argv)
+
+    has_display = bool(os.environ.get("DISPLAY")) or sys.platform == "win32"
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time()),
+        "results": {}
+    }
+
+    worker = Lins.PersistenceWorker()
+    for count in args.sizes:
+        print(f"Задач: {count}")
+        with BenchmarkContext(count, worker) as ctx:
+            result = {
+                "load_tasks": bench_load(ctx, args.repeat),
+                "monitor": bench_monitor(ctx, args.repeat),
+                "save_tasks": bench_save(ctx, args.repeat)
+            }
+            for renderer, key in (("widgets", "render"), ("canvas", "render_canvas")):
+                if args.skip_render:
+                    result[key] = {"skipped": "--skip-render"}
+                elif not has_display:
+                    result[key] = {"skipped": "нет дисплея, запустите через xvfb-run"}
+                else:
+                    result[key] = bench_render(ctx, args.repeat, renderer)
+        report["results"][str(count)] = result
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
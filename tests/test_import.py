@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Lins
+
+DUE = int(datetime(2027, 1, 15, 10, 0).timestamp())
+
+
+def ics(*todos):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for summary, rrule in todos:
+        lines += ["BEGIN:VTODO", f"SUMMARY:{summary}", "DUE:20270115T100000"]
+        if rrule:
+            lines.append(f"RRULE:{rrule}")
+        lines.append("END:VTODO")
+    lines.append("END:VCALENDAR")
+    return [line + "\r\n" for line in lines]
+
+
+class CsvImportTest(unittest.TestCase):
+    def parse(self, *rows):
+        lines = ["id,description,due,completed,created,recurrence"]
+        lines += [f"{i},Задача {i},15.01.2027 10:00,0,,{rule}" for i, rule in enumerate(rows)]
+        return [task.recurrence for task in Lins.read_csv_tasks(lines)]
+
+    def test_valid_rules_are_kept(self):
+        self.assertEqual(self.parse("daily", "weekly", "monthly:31"), ["daily", "weekly", "monthly:31"])
+
+    def test_bare_monthly_takes_day_of_due(self):
+        self.assertEqual(self.parse("monthly"), ["monthly:15"])
+
+    def test_invalid_rules_are_dropped(self):
+        self.assertEqual(self.parse("monthly:0", "monthly:40", "monthly:abc", "yearly"), [None] * 4)
+
+    def test_rule_without_due_is_dropped(self):
+        tasks = list(Lins.read_csv_tasks(["description,due,recurrence", "Без срока,,daily"]))
+        self.assertIsNone(tasks[0].recurrence)
+
+
+class IcsImportTest(unittest.TestCase):
+    def parse(self, *rrules):
+        return [task.recurrence for task in Lins.read_ics_tasks(ics(*(("Задача", rule) for rule in rrules)))]
+
+    def test_frequencies(self):
+        self.assertEqual(self.parse("FREQ=DAILY", "FREQ=WEEKLY", "FREQ=MONTHLY", None),
+                         ["daily", "weekly", "monthly:15", None])
+
+    def test_bymonthday_is_kept(self):
+        self.assertEqual(self.parse("FREQ=MONTHLY;BYMONTHDAY=31"), ["monthly:31"])
+
+    def test_out_of_range_bymonthday_falls_back_to_day_of_due(self):
+        self.assertEqual(self.parse("FREQ=MONTHLY;BYMONTHDAY=0", "FREQ=MONTHLY;BYMONTHDAY=-1",
+                                    "FREQ=MONTHLY;BYMONTHDAY=32"), ["monthly:15"] * 3)
+
+    def test_imported_rule_rolls_forward(self):
+        task = next(Lins.read_ics_tasks(ics(("Задача", "FREQ=MONTHLY;BYMONTHDAY=0"))))
+        self.assertEqual(task.due, DUE)
+        self.assertGreater(task.rolled_forward(DUE).due, DUE)
+
+    def test_export_round_trip(self):
+        task = Lins.Task("Отчёт; квартал, итоги", DUE, recurrence="monthly:31", task_id="abc")
+        [parsed] = Lins.read_ics_tasks("".join(Lins.ics_lines([task])).splitlines(keepends=True))
+        self.assertEqual((parsed.id, parsed.description, parsed.due, parsed.recurrence),
+                         ("abc", task.description, DUE, "monthly:31"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Lins
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.directory = self._temp.name
+        self.tasks_path = os.path.join(self.directory, Lins.TASKS_FILE)
+        self.journal_path = os.path.join(self.directory, Lins.JOURNAL_FILE)
+        self.worker = Lins.PersistenceWorker()
+
+    def tearDown(self):
+        self.worker.flush()
+        self._temp.cleanup()
+
+    def storage(self):
+        return Lins.JsonTaskStorage(self.worker, self.tasks_path, self.journal_path)
+
+    def load(self):
+        storage = self.storage()
+        tasks = {task.id: task for task in storage.load()}
+        return storage, tasks
+
+    def reload(self, storage):
+        storage.close()
+        self.worker.flush()
+        return self.load()
+
+    def write_snapshot(self, *tasks):
+        with open(self.tasks_path, "w", encoding="utf-8") as f:
+            json.dump([task.to_dict() for task in tasks], f)
+
+    def write_journal(self, path, records, tail=""):
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.write(tail)
+
+    def test_torn_last_line_is_skipped(self):
+        first = Lins.Task("Первая", 1_800_000_000, task_id="a")
+        second = Lins.Task("Вторая", 1_800_000_060, task_id="b")
+        self.write_snapshot(first)
+        self.write_journal(self.journal_path, [{"op": "add", "task": second.to_dict()}],
+                           tail='{"op": "add", "task": {"id": "c", "desc')
+
+        storage, tasks = self.load()
+        self.assertEqual(sorted(tasks), ["a", "b"])
+
+        # Следующая запись не должна склеиться с недописанной строкой
+        storage.add(Lins.Task("Третья", None, task_id="d"))
+        storage, tasks = self.reload(storage)
+        self.assertEqual(sorted(tasks), ["a", "b", "d"])
+        storage.close()
+
+    def test_replay_after_crash_mid_compaction(self):
+        # Сбой между ротацией журнала и записью снимка: tasks.json ещё старый, рядом лежит tasks.journal.1
+        first = Lins.Task("Первая", 1_800_000_000, task_id="a")
+        second = Lins.Task("Вторая", 1_800_000_060, task_id="b")
+        third = Lins.Task("Третья", 1_800_000_120, task_id="c")
+        self.write_snapshot(first)
+        self.write_journal(self.journal_path + ".1", [
+            {"op": "add", "task": second.to_dict()},
+            {"op": "update", "task": first.replace(completed=True).to_dict()}
+        ])
+        self.write_journal(self.journal_path, [
+            {"op": "delete", "id": "b"},
+            {"op": "add", "task": third.to_dict()}
+        ])
+
+        storage, tasks = self.load()
+        self.assertEqual(sorted(tasks), ["a", "c"])
+        self.assertTrue(tasks["a"].completed)
+        self.assertFalse(os.path.exists(self.journal_path + ".1"))
+        with open(self.tasks_path, "r", encoding="utf-8") as f:
+            self.assertEqual(sorted(data["id"] for data in json.load(f)), ["a", "c"])
+
+        storage, tasks = self.reload(storage)
+        self.assertEqual(sorted(tasks), ["a", "c"])
+        self.assertTrue(tasks["a"].completed)
+        storage.close()
+
+    def test_legacy_snapshot_without_ids_keeps_journal_references(self):
+        # tasks.json прежних версий не хранит id: выданные при загрузке идентификаторы должны сохраниться
+        with open(self.tasks_path, "w", encoding="utf-8") as f:
+            json.dump([
+                {"description": "A", "due": "01.01.2027 10:00", "completed": False, "created": "01.12.2026 10:00"},
+                {"description": "B", "due": "02.01.2027 10:00", "completed": False, "created": "01.12.2026 10:00"}
+            ], f)
+
+        storage, tasks = self.load()
+        by_description = {task.description: task for task in tasks.values()}
+        storage.update(by_description["A"].replace(completed=True))
+        storage.delete(by_description["B"])
+
+        storage, tasks = self.reload(storage)
+        self.assertEqual([(task.description, task.completed) for task in tasks.values()], [("A", True)])
+        storage.close()
+
+    def test_batched_writes_keep_order_across_rotation(self):
+        storage, tasks = self.load()
+        before = Lins.Task("До сжатия", None, task_id="a")
+        after = Lins.Task("После сжатия", None, task_id="b")
+        storage.add(before)
+        storage.compact()
+        storage.add(after)
+        storage.delete(before)
+        self.worker.flush()
+
+        with open(self.tasks_path, "r", encoding="utf-8") as f:
+            self.assertEqual([data["id"] for data in json.load(f)], ["a"])
+        storage, tasks = self.reload(storage)
+        self.assertEqual(sorted(tasks), ["b"])
+        storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()